@@ -2,6 +2,7 @@ const express = require("express");
 const router = express.Router();
 const { spawn } = require("child_process");
 const path = require("path");
+const readline = require("readline");
 
 
 const courses = [
@@ -1867,6 +1868,122 @@ function getPythonPath() {
   }
 }
 
+const WORKER_TIMEOUT_MS = 30000;
+
+let scheduleWorker = null;
+
+function getPythonExec() {
+  if (process.env.PYTHON_PATH && process.env.PYTHON_PATH.trim()) {
+    return process.env.PYTHON_PATH.trim();
+  }
+  return process.platform === "win32" ? "python" : "python3";
+}
+
+function startScheduleWorker() {
+  const pythonScriptPath = path.join(
+    __dirname,
+    "../../scripts/course_scraper.py"
+  );
+
+  const child = spawn(getPythonExec(), [pythonScriptPath, "serve"], {
+    stdio: ["pipe", "pipe", "pipe"],
+  });
+
+  const worker = { child, queue: [], active: null, nextId: 1, stderr: "" };
+
+  readline.createInterface({ input: child.stdout }).on("line", (line) => {
+    let response;
+    try {
+      response = JSON.parse(line);
+    } catch (parseError) {
+      console.error("Unparseable worker output:", line);
+      return;
+    }
+
+    const request = worker.active;
+    if (request && request.id === response.id) {
+      worker.active = null;
+      clearTimeout(request.timer);
+      request.resolve(response);
+      sendNext(worker);
+    }
+  });
+
+  child.stderr.on("data", (data) => {
+    worker.stderr = (worker.stderr + data.toString()).slice(-4000);
+  });
+
+  const fail = (error) => {
+    if (scheduleWorker === worker) {
+      scheduleWorker = null;
+    }
+    if (worker.active) {
+      clearTimeout(worker.active.timer);
+      worker.active.reject(error);
+      worker.active = null;
+    }
+    for (const request of worker.queue.splice(0)) {
+      request.reject(error);
+    }
+  };
+
+  child.on("error", fail);
+  child.stdin.on("error", fail);
+  child.on("close", () => {
+    console.error("Python worker exited:", worker.stderr);
+    fail(new Error(worker.stderr || "Python worker exited"));
+  });
+
+  return worker;
+}
+
+function enqueueRequest(request) {
+  if (!scheduleWorker) {
+    scheduleWorker = startScheduleWorker();
+  }
+
+  const worker = scheduleWorker;
+  worker.queue.push({ ...request, id: worker.nextId++ });
+  sendNext(worker);
+}
+
+function sendNext(worker) {
+  if (worker.active || worker.queue.length === 0) {
+    return;
+  }
+
+  const request = worker.queue.shift();
+  worker.active = request;
+
+  // the worker answers one request at a time, so the clock only starts once it has this one
+  request.timer = setTimeout(() => {
+    worker.active = null;
+    const error = new Error("Schedule generation timed out");
+    error.timedOut = true;
+    request.reject(error);
+
+    // a stuck worker would block every later request, so start fresh and hand it the queue
+    if (scheduleWorker === worker) {
+      scheduleWorker = null;
+    }
+    const queued = worker.queue.splice(0);
+    worker.child.kill("SIGTERM");
+    for (const { body, resolve, reject } of queued) {
+      enqueueRequest({ body, resolve, reject });
+    }
+  }, WORKER_TIMEOUT_MS);
+
+  worker.child.stdin.write(
+    JSON.stringify({ id: request.id, ...request.body }) + "\n"
+  );
+}
+
+function callScheduleWorker(body) {
+  return new Promise((resolve, reject) => {
+    enqueueRequest({ body, resolve, reject });
+  });
+}
+
 function createBlock(section, courseCode, type) {
   const blocks = [];
   const schedule = section.schedule || "TBA";
@@ -1983,7 +2100,8 @@ router.get("/", (req, res) => {
 });
 
 router.post("/generate-schedules", async (req, res) => {
-  const { courses: selectedCourses = [], prefs = {} } = req.body;
+  const { courses: selectedCourses = [], prefs = {}, constraints, planId, cursor, pageSize } = req.body;
+  const paged = Boolean(cursor || pageSize);
 
   if (!Array.isArray(selectedCourses) || selectedCourses.length === 0) {
     return res.status(400).json({ error: "courses[] required" });
@@ -2006,131 +2124,64 @@ router.post("/generate-schedules", async (req, res) => {
   console.log("Generating schedules for courses:", courseCodes);
 
   try {
-    const pythonScriptPath = path.join(
-      __dirname,
-      "../../scripts/course_scraper.py"
-    );
+    // with a planId the worker diffs against the plan's last course list and reuses its partial schedules;
+    // paged requests resume the search from the cursor instead. The worker's "stream" mode is not used here:
+    // the page answers as soon as the search has found pageSize schedules, which is how the UI gets its first
+    // results early, and one JSON body per page keeps the axios client as it is
+    const results = await callScheduleWorker({
+      command: planId && !paged ? "plan" : "generate",
+      plan_id: planId,
+      courses: courseCodes,
+      prefs: prefs && Object.keys(prefs).length ? prefs : undefined,
+      constraints,
+      format: "compact",
+      page_size: paged ? Number(pageSize) || undefined : undefined,
+      cursor: cursor || undefined,
+    });
 
-    
-    function getPythonExec() {
-      if (process.env.PYTHON_PATH && process.env.PYTHON_PATH.trim()) {
-        return process.env.PYTHON_PATH.trim();
-      }
-      return process.platform === "win32" ? "python" : "python3";
+    if (!results.success) {
+      return res.status(400).json({
+        error: results.error || "Schedule generation failed",
+        failed_courses: results.failed_courses || [],
+      });
     }
 
-    const pythonPath = getPythonExec();
 
-    const pythonProcess = spawn(
-      pythonPath,
-      [pythonScriptPath, "generate", ...courseCodes],
-      {
-        stdio: ["pipe", "pipe", "pipe"],
-      }
-    );
-
-    let stdout = "";
-    let stderr = "";
-
-    pythonProcess.stdout.on("data", (data) => {
+    // compact results list each section once and give schedules as indices into that table
+    const scores = results.schedule_fields && results.schedule_fields.score;
+    const schedules = results.valid_schedules.map((sectionIndices, index) => {
+      const blocks = [];
+      const crns = [];
 
-      stdout += data.toString();
-    });
+      sectionIndices.forEach((sectionIndex) => {
+        const section = results.sections[sectionIndex];
+        blocks.push(...createBlock(section, section.course_code, section.kind));
+        crns.push(section.crn);
+      });
 
-    pythonProcess.stderr.on("data", (data) => {
-      stderr += data.toString();
+      return {
+        crns,
+        blocks,
+        stats: calculateStats(blocks),
+        score: scores ? scores[index] : undefined,
+      };
     });
 
-    pythonProcess.on("close", (code) => {
-      if (code !== 0) {
-        console.error("Python script error:", stderr);
-        return res.status(500).json({
-          error: "Failed to generate schedules",
-          details: stderr || "Python script execution failed",
-        });
-      }
-
-
-      try {
-        const results = JSON.parse(stdout);
-
-        if (!results.success) {
-          return res.status(400).json({
-            error: results.error || "Schedule generation failed",
-            failed_courses: results.failed_courses || [],
-          });
-        }
-
-
-        const schedules = results.valid_schedules.map((schedule, index) => {
-          const blocks = [];
-          const crns = [];
-
-          schedule.courses.forEach((course) => {
-
-            if (course.lecture) {
-              const lectureBlocks = createBlock(
-                course.lecture,
-                course.course_code,
-                "LEC"
-              );
-              blocks.push(...lectureBlocks);
-              crns.push(course.lecture.crn);
-            }
-
-            if (course.lab) {
-              const labBlocks = createBlock(
-                course.lab,
-                course.course_code,
-                "LAB"
-              );
-              blocks.push(...labBlocks);
-              crns.push(course.lab.crn);
-            }
-
-            if (course.discussion) {
-              const discBlocks = createBlock(
-                course.discussion,
-                course.course_code,
-                "DIS"
-              );
-              blocks.push(...discBlocks);
-              crns.push(course.discussion.crn);
-            }
-          });
-
-          return {
-            crns,
-            blocks,
-            stats: calculateStats(blocks),
-          };
-        });
-
-        res.json({
-          count: schedules.length,
-          schedules,
-          total_combinations:
-            results.total_possible_combinations || schedules.length,
-          conflicting_combinations: results.conflicting_combinations_count || 0,
-        });
-      } catch (parseError) {
-        console.error("Error parsing Python output:", parseError);
-        console.error("Raw output:", stdout);
-        res.status(500).json({
-          error: "Failed to parse schedule results",
-          details: parseError.message,
-        });
-      }
+    res.json({
+      count: schedules.length,
+      schedules,
+      total_combinations:
+        results.total_possible_combinations || schedules.length,
+      conflicting_combinations: results.conflicting_combinations_count || 0,
+      pageStart: results.page_start,
+      nextCursor: results.next_cursor || null,
+      metrics: results.metrics,
     });
-
-    setTimeout(() => {
-      pythonProcess.kill("SIGTERM");
-      if (!res.headersSent) {
-        res.status(408).json({ error: "Schedule generation timed out" });
-      }
-    }, 30000);
   } catch (error) {
-    console.error("Error calling Python script:", error);
+    if (error.timedOut) {
+      return res.status(408).json({ error: "Schedule generation timed out" });
+    }
+    console.error("Error calling Python worker:", error);
     res.status(500).json({
       error: "Failed to generate schedules",
       details: error.message,
@@ -9,12 +9,16 @@ import {
 } from "../lib/share";
 import ResultsTimetable from "./ResultsTimeTable";
 
+const PAGE_SIZE = 25;
+
 export default function Results() {
   const [schedules, setSchedules] = useState(null);
   const [error, setError] = useState("");
   const [isGenerating, setIsGenerating] = useState(false);
   const [generationStats, setGenerationStats] = useState(null);
   const [menuOpen, setMenuOpen] = useState(-1); // which schedule’s share menu is open
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   const [prefs] = useState(() => {
     try {
@@ -56,15 +60,18 @@ export default function Results() {
     setSchedules(null);
     setError("");
     setGenerationStats(null);
+    setNextCursor(null);
 
     try {
       const response = await api.post("/courses/generate-schedules", {
         courses: selectedCourses,
         prefs,
+        pageSize: PAGE_SIZE,
       });
 
       if (response.data.schedules) {
         setSchedules(response.data.schedules);
+        setNextCursor(response.data.nextCursor || null);
         setGenerationStats({
           total_combinations: response.data.total_combinations || 0,
           valid_count: response.data.count || 0,
@@ -98,6 +105,39 @@ export default function Results() {
     }
   };
 
+  const loadMore = async () => {
+    const selectedCourses = JSON.parse(
+      sessionStorage.getItem("selectedCourses") || "[]"
+    );
+
+    setIsLoadingMore(true);
+    try {
+      // the cursor resumes the server's search where the last page stopped
+      const response = await api.post("/courses/generate-schedules", {
+        courses: selectedCourses,
+        prefs,
+        pageSize: PAGE_SIZE,
+        cursor: nextCursor,
+      });
+      const page = response.data.schedules || [];
+
+      setSchedules((current) => [...current, ...page]);
+      setNextCursor(response.data.nextCursor || null);
+      setGenerationStats((stats) => ({
+        ...stats,
+        valid_count: stats.valid_count + page.length,
+      }));
+    } catch (err) {
+      setError(
+        err?.response?.data?.error ||
+          err?.message ||
+          "Failed to load more schedules"
+      );
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   async function exportToGoogle(plan, name) {
     try {
       const { data } = await api.post("/calendar/export", {
@@ -246,14 +286,19 @@ export default function Results() {
         }}
       >
         <h2 className="h2">
-          Schedule Results <span className="muted">({schedules.length})</span>
+          Schedule Results{" "}
+          <span className="muted">
+            ({schedules.length}
+            {nextCursor && "+"})
+          </span>
         </h2>
         {generationStats && (
           <div
             className="stat"
             style={{ fontSize: "14px" }}
           >
-            {generationStats.valid_count} valid of{" "}
+            {generationStats.valid_count}
+            {nextCursor && "+"} valid of{" "}
             {generationStats.total_combinations} total combinations
             {generationStats.conflicting_count > 0 && (
               <> • {generationStats.conflicting_count} conflicting</>
@@ -456,6 +501,17 @@ export default function Results() {
         ))}
       </div>
 
+      {nextCursor && (
+        <button
+          className="btn btn-primary"
+          style={{ alignSelf: "center" }}
+          onClick={loadMore}
+          disabled={isLoadingMore}
+        >
+          {isLoadingMore ? "Loading..." : `Load ${PAGE_SIZE} more`}
+        </button>
+      )}
+
       <style jsx>{`
         @keyframes spin {
           0% {
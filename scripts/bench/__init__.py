@@ -0,0 +1,2 @@
+from bench.catalog import syntheticCatalog
+from bench.stub_server import StubBanner
@@ -0,0 +1,51 @@
+import json
+import sys
+
+from bench.runner import SCENARIOS, compareReports, runBenchmarks
+from course_scraper import parseArgs
+
+DEFAULTS = {
+    'courses': 5,
+    'lectures': 6,
+    'labs': 2,
+    'discussions': 1,
+    'density': 0.0,
+    'seed': 0,
+    'latency': 0.005,
+    'repeat': 3,
+    'limit': None,
+    'processes': 1,
+    'concurrency': 4
+}
+
+def main():
+    scenarios, options = parseArgs(sys.argv[1:])
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(json.dumps({
+            'success': False,
+            'error': f"Unknown scenarios: {', '.join(unknown)}. Choose from {', '.join(SCENARIOS)}"
+        }))
+        return
+
+    params = dict(DEFAULTS)
+    for name, default in DEFAULTS.items():
+        if name in options:
+            params[name] = float(options[name]) if name in ('density', 'latency') else int(options[name])
+    if options.get('startup_baseline'):
+        params['startup_baseline'] = options['startup_baseline']
+
+    report = runBenchmarks(params, scenarios or SCENARIOS)
+
+    if options.get('compare'):
+        with open(options['compare']) as f:
+            report['comparison'] = compareReports(json.load(f), report)
+
+    output = json.dumps(report, indent=2)
+    if options.get('output'):
+        with open(options['output'], 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import random
+from typing import Dict, List
+
+LECTURE_DAYS = ['MWF', 'TR', 'MW']
+SECONDARY_DAYS = ['M', 'T', 'W', 'R', 'F']
+DAY_NAMES = (('monday', 'M'), ('tuesday', 'T'), ('wednesday', 'W'), ('thursday', 'R'),
+             ('friday', 'F'), ('saturday', 'S'), ('sunday', 'U'))
+FIRST_HOUR = 8
+WINDOW_HOURS = 12
+
+def bannerSection(subject: str, number: str, crn: int, sequence: int, schedule_type: str, days: str,
+                  start: int, length: int, seats: int, instructor: str) -> Dict:
+    end = start + length
+    return {
+        'courseReferenceNumber': str(crn),
+        'courseTitle': f"{subject} {number} (synthetic)",
+        'subject': subject,
+        'courseNumber': number,
+        'sequenceNumber': f"{sequence:03d}",
+        'scheduleTypeDescription': schedule_type,
+        'enrollment': 0,
+        'maximumEnrollment': max(seats, 1),
+        'seatsAvailable': seats,
+        'faculty': [{'displayName': instructor}],
+        'meetingsFaculty': [{
+            'meetingTime': {
+                **{day: abbrev in days for day, abbrev in DAY_NAMES},
+                'beginTime': '%02d%02d' % divmod(start, 60),
+                'endTime': '%02d%02d' % divmod(end, 60),
+                'buildingDescription': 'BENCH',
+                'room': str(100 + crn % 50)
+            }
+        }]
+    }
+
+def syntheticCatalog(courses: int = 6, lectures: int = 3, labs: int = 2, discussions: int = 1,
+                     density: float = 0.5, seed: int = 0, subject: str = 'BENCH') -> Dict[str, List[Dict]]:
+    # density 0 spreads start times over the day, 1 stacks every meeting into the first hour
+    rnd = random.Random(seed)
+    hours = max(1, round(WINDOW_HOURS * (1 - min(max(density, 0.0), 1.0))))
+    instructors = [f"Instructor {i}" for i in range(max(2, lectures))]
+    catalog = {}
+    crn = 10000
+
+    def startMinute():
+        return (FIRST_HOUR + rnd.randrange(hours)) * 60 + rnd.choice((0, 30))
+
+    # secondary sections share their lecture's decade, which is what the linking heuristics pair on
+    for c in range(courses):
+        number = f"{c + 1:03d}"
+        rows = []
+        for lec in range(lectures):
+            base = lec * 10 + 1
+            crn += 1
+            rows.append(bannerSection(subject, number, crn, base, 'Lecture', rnd.choice(LECTURE_DAYS),
+                                      startMinute(), 50, rnd.randint(0, 40), rnd.choice(instructors)))
+            for i in range(labs):
+                crn += 1
+                rows.append(bannerSection(subject, number, crn, base + 1 + i, 'Laboratory', rnd.choice(SECONDARY_DAYS),
+                                          startMinute(), 110, rnd.randint(0, 24), rnd.choice(instructors)))
+            for i in range(discussions):
+                crn += 1
+                rows.append(bannerSection(subject, number, crn, base + 1 + labs + i, 'Discussion', rnd.choice(SECONDARY_DAYS),
+                                          startMinute(), 50, rnd.randint(0, 30), rnd.choice(instructors)))
+        catalog[f"{subject}{number}"] = rows
+
+    return catalog
@@ -0,0 +1,217 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+import course_scraper
+from bench.catalog import syntheticCatalog
+from bench.stub_server import StubBanner
+
+TERM = '202540'
+SCENARIOS = ('link', 'search', 'count', 'generate_http', 'startup')
+HEAVY_MODULES = ('requests', 'bs4', 'multiprocessing')
+STARTUP_PROBE = """
+import json, sys
+sys.argv = ['course_scraper.py', 'generate', *{courses!r}, '--offline', '--cache', {cache!r}]
+import course_scraper
+course_scraper.main()
+sys.stderr.write('BENCH ' + json.dumps([name for name in {heavy!r} if name in sys.modules]) + '\\n')
+"""
+
+def gitRevision() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SCRIPTS_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+    return {'commit': commit, 'dirty': dirty}
+
+def baselineScript(revision: str, directory: str) -> str:
+    source = subprocess.run(['git', 'show', f"{revision}:./course_scraper.py"], cwd=SCRIPTS_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'course_scraper.py'), 'w') as f:
+        f.write(source)
+    return directory
+
+def writeReplay(catalog: Dict[str, List[Dict]], directory: str):
+    os.makedirs(os.path.join(directory, TERM), exist_ok=True)
+    for code, rows in catalog.items():
+        with open(os.path.join(directory, TERM, f"{code}.json"), 'w') as f:
+            json.dump({'success': True, 'totalCount': len(rows), 'data': rows}, f)
+
+def measure(run: Callable[[], Dict], repeat: int) -> Dict:
+    walls = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        walls.append(time.perf_counter() - started)
+
+    # tracing slows everything down, so peak memory comes from one extra run
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_seconds': min(walls),
+        'wall_seconds_median': statistics.median(walls),
+        'peak_bytes': peak,
+        **result
+    }
+
+def linkScenario(catalog: Dict[str, List[Dict]]) -> Callable[[], Dict]:
+    scraper = course_scraper.UCRCourseScraper(catalog_path=None)
+    courses = []
+    for rows in catalog.values():
+        sections = [course_scraper.Section.fromDict(scraper.normalizeSection(row)) for row in rows]
+        courses.append(tuple([section for section in sections if section.categorized_type == kind]
+                             for kind in ('lecture', 'lab', 'discussion')))
+
+    def run():
+        combinations = sum(len(scraper.findLink(*course)) for course in courses)
+        return {'combinations': combinations}
+
+    return run
+
+def searchScenario(replay_dir: str, courses: List[str], limit: Optional[int], processes: int) -> Callable[[], Dict]:
+    def run():
+        scraper = course_scraper.UCRCourseScraper(catalog_path=None, source=replay_dir, processes=processes)
+        result = scraper.scheduleGenerate(courses, TERM, limit)
+        return {
+            'schedules': result.get('valid-Combo_count'),
+            'total_combinations': result.get('total_possible_combinations'),
+            'search_nodes': result.get('search_stats', {}).get('nodes_visited')
+        }
+
+    return run
+
+def countScenario(replay_dir: str, courses: List[str]) -> Callable[[], Dict]:
+    def run():
+        scraper = course_scraper.UCRCourseScraper(catalog_path=None, source=replay_dir)
+        result = scraper.countSchedules(courses, TERM)
+        return {
+            'schedules': result.get('valid-Combo_count'),
+            'memo_entries': result.get('count_stats', {}).get('memo_entries')
+        }
+
+    return run
+
+def httpScenario(stub: StubBanner, courses: List[str], limit: Optional[int], concurrency: int) -> Callable[[], Dict]:
+    def run():
+        # large enough that the limiter never throttles the local stub
+        scraper = course_scraper.UCRCourseScraper(catalog_path=None, base_url=stub.url, max_concurrency=concurrency,
+                                                  rate_limit=10000.0, rate_burst=10000)
+        result = scraper.scheduleGenerate(courses, TERM, limit)
+        metrics = result['metrics']
+        return {
+            'schedules': result.get('valid-Combo_count'),
+            'search_nodes': result.get('search_stats', {}).get('nodes_visited'),
+            'http_seconds': metrics['phases'].get('http', 0.0),
+            'http_requests': metrics['counters'].get('http_requests', 0),
+            'http_bytes': metrics['counters'].get('http_bytes', 0),
+            'session_setup_seconds': metrics['phases'].get('session_setup', 0.0)
+        }
+
+    return run
+
+def startupScenario(script_dir: str, cache_path: str, courses: List[str]) -> Callable[[], Dict]:
+    # a fresh interpreter answering from a warm catalog, which is the cold start every CLI call pays
+    probe = STARTUP_PROBE.format(courses=courses, cache=cache_path, heavy=HEAVY_MODULES)
+
+    def run():
+        finished = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], cwd=script_dir,
+                                  capture_output=True, text=True, check=True)
+        import_us = 0
+        loaded = []
+        for line in finished.stderr.splitlines():
+            if line.rstrip().endswith('| course_scraper'):
+                import_us = int(line.split('|')[1])
+            elif line.startswith('BENCH '):
+                loaded = json.loads(line[6:])
+        return {
+            'import_seconds': import_us / 1e6,
+            'heavy_modules_loaded': len(loaded),
+            'modules_loaded': loaded
+        }
+
+    return run
+
+def runBenchmarks(params: Dict, scenarios=SCENARIOS) -> Dict:
+    catalog = syntheticCatalog(params['courses'], params['lectures'], params['labs'], params['discussions'],
+                               params['density'], params['seed'])
+    courses = list(catalog)
+    results = {}
+    replay_dir = tempfile.mkdtemp(prefix='schedule-bench-')
+    settle = course_scraper.SESSION_SETTLE_SECONDS
+
+    try:
+        writeReplay(catalog, replay_dir)
+
+        if 'link' in scenarios:
+            results['link'] = measure(linkScenario(catalog), params['repeat'])
+        if 'search' in scenarios:
+            results['search'] = measure(searchScenario(replay_dir, courses, params['limit'], params['processes']), params['repeat'])
+        if 'count' in scenarios:
+            results['count'] = measure(countScenario(replay_dir, courses), params['repeat'])
+        if 'startup' in scenarios:
+            cache_path = os.path.join(replay_dir, 'catalog.sqlite3')
+            course_scraper.UCRCourseScraper(catalog_path=cache_path, source=replay_dir).scheduleGenerate(courses, TERM, 1)
+            results['startup'] = measure(startupScenario(SCRIPTS_DIR, cache_path, courses), params['repeat'])
+            if params.get('startup_baseline'):
+                baseline_dir = baselineScript(params['startup_baseline'], os.path.join(replay_dir, 'baseline'))
+                results['startup_baseline'] = measure(startupScenario(baseline_dir, cache_path, courses), params['repeat'])
+        if 'generate_http' in scenarios:
+            # the stub keeps no server-side search state, so there is nothing to wait out
+            course_scraper.SESSION_SETTLE_SECONDS = 0
+            with StubBanner(catalog, params['latency']) as stub:
+                results['generate_http'] = measure(httpScenario(stub, courses, params['limit'], params['concurrency']),
+                                                   params['repeat'])
+    finally:
+        course_scraper.SESSION_SETTLE_SECONDS = settle
+        shutil.rmtree(replay_dir, ignore_errors=True)
+
+    return {
+        **gitRevision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'params': params,
+        'results': results
+    }
+
+def compareReports(baseline: Dict, current: Dict) -> Dict:
+    # current over baseline for every numeric metric both reports share
+    comparison = {}
+
+    for scenario, metrics in current['results'].items():
+        before = baseline.get('results', {}).get(scenario)
+        if not before:
+            continue
+        comparison[scenario] = {
+            metric: round(value / before[metric], 3)
+            for metric, value in metrics.items()
+            if isinstance(value, (int, float)) and isinstance(before.get(metric), (int, float)) and before[metric]
+        }
+
+    return {
+        'baseline_commit': baseline.get('commit'),
+        'current_commit': current.get('commit'),
+        'same_params': baseline.get('params') == current.get('params'),
+        'ratios': comparison
+    }
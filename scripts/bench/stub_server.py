@@ -0,0 +1,119 @@
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+CLASS_SEARCH_PAGE = '<html><head></head><body><script>var synchronizerToken = "{token}";</script></body></html>'
+
+class StubBanner:
+    # sessions go by the JSESSIONID cookie like the real host, so an unknown session gets the login page
+    def __init__(self, catalog: Dict[str, List[Dict]], latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        self.catalog = catalog
+        self.latency = latency
+        self.sessions = set()
+        self.requests: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StubBanner':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def subjects(self) -> List[str]:
+        return sorted({re.match(r'[A-Z]+', code).group(0) for code in self.catalog})
+
+    def searchRows(self, query: Dict[str, List[str]]) -> List[Dict]:
+        combo = query.get('txt_subjectcoursecombo', [''])[0].upper()
+        if combo:
+            return self.catalog.get(combo, [])
+
+        subject = query.get('txt_subject', [''])[0].upper()
+        return [row for code, rows in self.catalog.items() if code.startswith(subject) for row in rows]
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send(self, body: str, content_type: str = 'application/json', cookie: str = None):
+                data = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                if cookie:
+                    self.send_header('Set-Cookie', cookie)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self.route()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                self.route()
+
+            def session(self):
+                match = re.search(r'JSESSIONID=([^;]+)', self.headers.get('Cookie', ''))
+                return match.group(1) if match and match.group(1) in stub.sessions else None
+
+            def route(self):
+                time.sleep(stub.latency)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                endpoint = url.path.rsplit('/', 1)[-1]
+
+                with stub.lock:
+                    stub.requests[endpoint] = stub.requests.get(endpoint, 0) + 1
+
+                if endpoint == 'StudentRegistrationSsb':
+                    session_id = uuid.uuid4().hex
+                    with stub.lock:
+                        stub.sessions.add(session_id)
+                    return self.send('<html></html>', 'text/html', f"JSESSIONID={session_id}; Path=/")
+
+                if endpoint == 'classSearch':
+                    return self.send(CLASS_SEARCH_PAGE.format(token=uuid.uuid4()), 'text/html')
+
+                if endpoint == 'searchResults':
+                    if self.session() is None:
+                        return self.send('<html>Login</html>', 'text/html')
+                    rows = stub.searchRows(query)
+                    offset = int(query.get('pageOffset', ['0'])[0])
+                    size = int(query.get('pageMaxSize', ['10'])[0])
+                    return self.send(json.dumps({
+                        'success': True,
+                        'totalCount': len(rows),
+                        'data': rows[offset:offset + size] or None
+                    }))
+
+                if endpoint == 'get_subject':
+                    return self.send(json.dumps([{'code': subject, 'description': subject} for subject in stub.subjects()]))
+
+                # termSelection, term/search and resetDataForm only need to succeed
+                return self.send('{}')
+
+        return Handler
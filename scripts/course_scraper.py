@@ -1,44 +1,596 @@
 import sys
+import os
+import io
 import json
-import requests
 import time
 import re
-from bs4 import BeautifulSoup
-from typing import Dict, List, Optional, Union, Tuple
+import html
+import math
+import heapq
+import itertools
+import hashlib
+import base64
+import sqlite3
+import contextlib
+import cProfile
+import zlib
+import threading
+import socketserver
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Union, Tuple
 from datetime import datetime
-from itertools import product
 
-class UCRCourseScraper:
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+BANNER_URL = "https://registrationssb.ucr.edu"
+SLOT_MINUTES = 5
+DAY_SLOTS = 24 * 60 // SLOT_MINUTES
+DAY_INDEX = {'M': 0, 'T': 1, 'W': 2, 'R': 3, 'F': 4, 'S': 5, 'U': 6}
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br, zstd',
+    'Connection': 'keep-alive',
+    'Sec-Ch-Ua': '"Not;A=Brand";v="99", "Google Chrome";v="139", "Chromium";v="139"',
+    'Sec-Ch-Ua-Mobile': '?0',
+    'Sec-Ch-Ua-Platform': '"Windows"',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Dest': 'empty',
+}
+
+SESSION_TTL = 15 * 60
+SESSION_SETTLE_SECONDS = 1
+MAX_CONCURRENCY = 4
+CATALOG_PATH = os.environ.get('SCHEDULEEASE_CATALOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'catalog.sqlite3'))
+CATALOG_TTL = 60 * 60
+SEARCH_PAGE_SIZE = 500
+PAGE_PARAMS = ('pageOffset', 'pageMaxSize')
+RESULT_CACHE_BYTES = 32 * 1024 * 1024
+RESULT_DISK_BYTES = 256 * 1024 * 1024
+PLAN_LIMIT = 64
+PLAN_PARTIAL_LIMIT = 200000
+PROFILE_PATH = "course_scraper.prof"
+PAGE_SIZE = 25
+WARM_RATE = 2.0
+WARM_INTERVAL = 15 * 60
+WARM_PAIRS = 50
+POPULARITY_WINDOW = 7 * 24 * 60 * 60
+COMPACT_SEPARATORS = (',', ':')
+PARALLEL_MIN_WORK = 50000
+COMPAT_MEMORY_PAIRS = 1024
+COMPAT_CATALOG_CELLS = 4096
+COMPAT_CATALOG_ROWS = 20000
+RATE_LIMIT = 10.0
+RATE_BURST = 10
+
+def weekMask(days: List[str], start: int, end: int) -> int:
+    if start == -1 or end == -1:
+        return 0
+    
+    first = start // SLOT_MINUTES
+    last = -(-end // SLOT_MINUTES)
+    if last <= first:
+        return 0
+    
+    run = ((1 << (last - first)) - 1) << first
+    mask = 0
+    for day in days:
+        mask |= run << (DAY_INDEX[day] * DAY_SLOTS)
+    
+    return mask
+
+def classesDigest(classes: List[Dict]) -> str:
+    return hashlib.sha1(','.join(format(group['mask'], 'x') for group in classes).encode()).hexdigest()
+
+def compatRows(rows: List[Dict], columns: List[Dict]) -> List[int]:
+    # bit j of row i is set when class i of one course fits beside class j of the other
+    masks = [group['mask'] for group in columns]
+    compat = []
+    for group in rows:
+        mask = group['mask']
+        bits = 0
+        for j, other in enumerate(masks):
+            if not mask & other:
+                bits |= 1 << j
+        compat.append(bits)
+    return compat
+
+def encodeCursor(position: Dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position, separators=COMPACT_SEPARATORS).encode()).decode().rstrip('=')
+
+def decodeCursor(cursor: str) -> Optional[Dict]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    return position if isinstance(position, dict) and {'digest', 'path', 'offset', 'emitted'} <= set(position) else None
+
+class Enrollment:
+    # left mutable on purpose: seat counts change far more often than a section's meeting times
+    __slots__ = ('current', 'maximum', 'available')
+
+    def __init__(self, current: int, maximum: int, available: int):
+        self.current = current
+        self.maximum = maximum
+        self.available = available
+
+    def __reduce__(self):
+        return (Enrollment, (self.current, self.maximum, self.available))
+
+    def toDict(self) -> Dict:
+        return {'current': self.current, 'maximum': self.maximum, 'available': self.available}
+
+@dataclass(frozen=True)
+class Section:
+    __slots__ = ('crn', 'course_title', 'course_code', 'section', 'schedule_type', 'categorized_type', 'enrollment',
+                 'instructors', 'schedule', 'location', 'days', 'start', 'end', 'raw_start_time', 'raw_end_time',
+                 'week_mask')
+    crn: str
+    course_title: str
+    course_code: str
+    section: str
+    schedule_type: str
+    categorized_type: str
+    enrollment: Enrollment
+    instructors: Tuple[str, ...]
+    schedule: str
+    location: str
+    days: str
+    start: int
+    end: int
+    raw_start_time: str
+    raw_end_time: str
+    week_mask: int
+
+    @classmethod
+    def fromDict(cls, section: Dict) -> 'Section':
+        intern = sys.intern
+        enrollment = section['enrollment']
+        days = ''.join(section['days_list'])
+        return cls(
+            section['crn'],
+            section['course_title'],
+            intern(section['course_code']),
+            section['section'],
+            intern(section['schedule_type']),
+            intern(section['categorized_type']),
+            Enrollment(enrollment['current'], enrollment['maximum'], enrollment['available']),
+            tuple(intern(name) for name in section['instructors']),
+            intern(section['schedule']),
+            intern(section['location']),
+            intern(days),
+            section['start_time_minutes'],
+            section['end_time_minutes'],
+            section['raw_start_time'],
+            section['raw_end_time'],
+            weekMask(days, section['start_time_minutes'], section['end_time_minutes'])
+        )
+
+    def __reduce__(self):
+        # frozen slots objects can't be rebuilt through setattr, which the default pickling uses
+        return (Section, tuple(getattr(self, field.name) for field in fields(self)))
+
+    def toDict(self) -> Dict:
+        return {
+            'crn': self.crn,
+            'course_title': self.course_title,
+            'course_code': self.course_code,
+            'section': self.section,
+            'schedule_type': self.schedule_type,
+            'categorized_type': self.categorized_type,
+            'enrollment': self.enrollment.toDict(),
+            'instructors': list(self.instructors),
+            'schedule': self.schedule,
+            'location': self.location,
+            'days_list': list(self.days),
+            'start_time_minutes': self.start,
+            'end_time_minutes': self.end,
+            'raw_start_time': self.raw_start_time,
+            'raw_end_time': self.raw_end_time
+        }
+
+class Combo:
+    __slots__ = ('lecture', 'lab', 'discussion', 'mask', 'conflict', 'output')
+
+    def __init__(self, lecture: Section, lab: Optional[Section], discussion: Optional[Section]):
+        mask = 0
+        conflict = False
+        for section in (lecture, lab, discussion):
+            if section is not None:
+                conflict = conflict or bool(mask & section.week_mask)
+                mask |= section.week_mask
+        
+        self.lecture = lecture
+        self.lab = lab
+        self.discussion = discussion
+        self.mask = mask
+        self.conflict = conflict
+        self.output = None
+
+    def __reduce__(self):
+        return (Combo, (self.lecture, self.lab, self.discussion))
+
+    def sections(self) -> Iterator[Tuple[str, Section]]:
+        if self.lecture is not None:
+            yield 'lecture', self.lecture
+        if self.lab is not None:
+            yield 'lab', self.lab
+        if self.discussion is not None:
+            yield 'discussion', self.discussion
+
+    def view(self) -> Dict:
+        # built once and shared by every schedule the combo appears in; callers must not mutate it
+        if self.output is None:
+            output = {'course_code': self.lecture.course_code}
+            for part, section in self.sections():
+                output[part] = {
+                    'crn': section.crn,
+                    'section': section.section,
+                    'schedule': section.schedule,
+                    'location': section.location,
+                    'instructors': list(section.instructors)
+                }
+            self.output = output
+        return self.output
+
+    def toDict(self) -> Dict:
+        return {
+            'lecture': self.lecture.toDict(),
+            'lab': self.lab.toDict() if self.lab else None,
+            'discussion': self.discussion.toDict() if self.discussion else None,
+            'mask': self.mask,
+            'conflict': self.conflict
+        }
+
+DEFAULT_WEIGHTS = {
+    'early_start': 1.0,
+    'late_end': 1.0,
+    'campus_days': 60.0,
+    'gaps': 0.5,
+    'seats': 240.0,
+    'instructors': 120.0
+}
+
+def clockMinutes(value: Union[str, int]) -> int:
+    if isinstance(value, int):
+        return value
+    
+    match = re.match(r'^\s*(\d{1,2}):?(\d{2})\s*([AaPp][Mm])?\s*$', str(value))
+    if not match:
+        raise ValueError(f"Invalid time: {value}. Use 24-hour 'HH:MM' or 'H:MM AM'")
+    
+    hour, minute = int(match.group(1)), int(match.group(2))
+    meridiem = (match.group(3) or '').upper()
+    if meridiem == 'PM' and hour != 12:
+        hour += 12
+    elif meridiem == 'AM' and hour == 12:
+        hour = 0
+    
+    return hour * 60 + minute
+
+class SchedulePrefs:
+    def __init__(self, prefs: Dict):
+        weights = prefs.get('weights') or {}
+        unknown = set(weights) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown preference weights: {', '.join(sorted(unknown))}")
+        
+        self.weights = {name: float(weights.get(name, default)) for name, default in DEFAULT_WEIGHTS.items()}
+        self.start_after = clockMinutes(prefs.get('start_after', '09:00'))
+        self.end_before = clockMinutes(prefs.get('end_before', '17:00'))
+        self.preferred_instructors = [name.lower() for name in prefs.get('preferred_instructors') or []]
+        self.top_k = max(1, int(prefs.get('top_k', 20)))
+
+class ScheduleConstraints:
+    def __init__(self, spec: Dict):
+        self.forbidden = 0
+        
+        if spec.get('not_before') is not None:
+            self.forbidden |= weekMask(list(DAY_INDEX), 0, clockMinutes(spec['not_before']))
+        if spec.get('not_after') is not None:
+            self.forbidden |= weekMask(list(DAY_INDEX), clockMinutes(spec['not_after']), 24 * 60)
+        
+        self.forbidden |= weekMask(self.parseDays(''.join(spec.get('days_off') or [])), 0, 24 * 60)
+        
+        for block in spec.get('blocked') or []:
+            self.forbidden |= weekMask(self.parseDays(block['days']), clockMinutes(block['start']), clockMinutes(block['end']))
+        
+        self.pinned_crns = {str(crn) for crn in spec.get('pinned_crns') or []}
+        self.excluded_crns = {str(crn) for crn in spec.get('excluded_crns') or []}
+        self.excluded_instructors = [name.lower() for name in spec.get('excluded_instructors') or []]
+
+    def parseDays(self, days: str) -> List[str]:
+        days = [day.upper() for day in days]
+        unknown = set(days) - set(DAY_INDEX)
+        if unknown:
+            raise ValueError(f"Unknown days: {', '.join(sorted(unknown))}. Use M, T, W, R, F, S, U")
+        return days
+
+    def allowsSection(self, section: 'Section') -> bool:
+        if section.crn in self.excluded_crns:
+            return False
+        
+        if self.excluded_instructors:
+            for name in section.instructors:
+                if any(excluded in name.lower() for excluded in self.excluded_instructors):
+                    return False
+        
+        return not (section.week_mask & self.forbidden)
+
+    def filterCombos(self, course_options: Dict) -> List['Combo']:
+        sections = course_options['lectures'] + course_options['labs'] + course_options['discussions']
+        allowed = {section.crn for section in sections if self.allowsSection(section)}
+        pinned = self.pinned_crns & {section.crn for section in sections}
+        
+        filtered = []
+        for combo in course_options['combinations']:
+            crns = {section.crn for _, section in combo.sections()}
+            if crns <= allowed and pinned <= crns:
+                filtered.append(combo)
+        
+        return filtered
+
+class SessionExpired(Exception):
+    pass
+
+class Metrics:
+    # phase seconds are summed across fetch threads, so together they can exceed total_seconds
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.perf_counter()
+            self.phases: Dict[str, float] = {}
+            self.counters: Dict[str, int] = {}
+            self.courses: Dict[str, Dict[str, Dict]] = {}
+
+    def courseEntry(self) -> Optional[Dict[str, Dict]]:
+        course = getattr(self.local, 'course', None)
+        if course is None:
+            return None
+        return self.courses.setdefault(course, {'phases': {}, 'counters': {}})
+
+    @contextlib.contextmanager
+    def course(self, course_code: str):
+        previous = getattr(self.local, 'course', None)
+        self.local.course = course_code
+        try:
+            yield
+        finally:
+            self.local.course = previous
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(name, time.perf_counter() - started)
+
+    @contextlib.contextmanager
+    def detached(self):
+        # work on this thread that no request is waiting for records nothing
+        self.local.detached = True
+        try:
+            yield
+        finally:
+            self.local.detached = False
+
+    def addTime(self, name: str, seconds: float):
+        if getattr(self.local, 'detached', False):
+            return
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+            entry = self.courseEntry()
+            if entry is not None:
+                entry['phases'][name] = entry['phases'].get(name, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1):
+        if getattr(self.local, 'detached', False):
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            entry = self.courseEntry()
+            if entry is not None:
+                entry['counters'][name] = entry['counters'].get(name, 0) + amount
+
+    def timed(self, name: str, iterable) -> Iterator:
+        # only the time spent producing each item, not the consumer's time between items
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.addTime(name, time.perf_counter() - started)
+                return
+            self.addTime(name, time.perf_counter() - started)
+            yield item
+
+    def toDict(self) -> Dict:
+        with self.lock:
+            return {
+                'total_seconds': round(time.perf_counter() - self.started, 6),
+                'phases': {name: round(seconds, 6) for name, seconds in self.phases.items()},
+                'counters': dict(self.counters),
+                'courses': {
+                    course: {
+                        'phases': {name: round(seconds, 6) for name, seconds in entry['phases'].items()},
+                        'counters': dict(entry['counters'])
+                    }
+                    for course, entry in self.courses.items()
+                }
+            }
+
+class SectionTable:
+    KINDS = {'lecture': 'LEC', 'lab': 'LAB', 'discussion': 'DIS'}
+
     def __init__(self):
+        self.positions: Dict[str, int] = {}
+        self.rows: List[Dict] = []
+        self.flushed = 0
+
+    def add(self, section: Section, kind: str) -> int:
+        position = self.positions.get(section.crn)
+        if position is None:
+            position = len(self.rows)
+            self.positions[section.crn] = position
+            self.rows.append({
+                'crn': section.crn,
+                'course_code': section.course_code,
+                'kind': kind,
+                'section': section.section,
+                'schedule': section.schedule,
+                'location': section.location,
+                'instructors': list(section.instructors)
+            })
+        return position
+
+    def indices(self, combination: Tuple[Combo, ...]) -> List[int]:
+        return [self.add(section, self.KINDS[part]) for combo in combination for part, section in combo.sections()]
+
+    def pending(self) -> List[Tuple[int, Dict]]:
+        # rows added since the last call, for streams that ship the table as it grows
+        start, self.flushed = self.flushed, len(self.rows)
+        return list(enumerate(self.rows[start:], start))
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+TOKEN_PATTERNS = [
+    re.compile(r'synchronizerToken["\']?\s*[:=]\s*["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(r'token["\']?\s*[:=]\s*["\']([a-f0-9-]{36})["\']', re.IGNORECASE),
+    re.compile(r'csrfToken["\']?\s*[:=]\s*["\']([^"\']+)["\']', re.IGNORECASE),
+]
+# comments and script bodies are not markup, so neither may supply a meta or input tag
+SCRIPT_OR_COMMENT = re.compile(r'<!--.*?-->|<script\b[^>]*>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+TAG_PATTERNS = {
+    'meta': re.compile(r'<meta\b([^>]*)>', re.IGNORECASE),
+    'input': re.compile(r'<input\b([^>]*)>', re.IGNORECASE)
+}
+TAG_ATTRIBUTE = re.compile(r'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+TOKEN_META_NAMES = ('_token', 'csrf-token', 'synchronizer-token')
+
+def tagAttributes(text: str) -> Dict[str, str]:
+    return {name.lower(): html.unescape(double or single or bare or '')
+            for name, double, single, bare in TAG_ATTRIBUTE.findall(text)}
+
+def extractToken(page: str) -> Optional[str]:
+    # same lookup order as the soup walk below: script bodies, then meta tags, then hidden inputs
+    scripts = []
+    
+    def skip(match):
+        if match.group(1) is not None:
+            scripts.append(match.group(1))
+        return ' '
+    
+    markup = SCRIPT_OR_COMMENT.sub(skip, page)
+    for body in scripts:
+        for pattern in TOKEN_PATTERNS:
+            match = pattern.search(body)
+            if match:
+                return match.group(1)
+    
+    for attributes in map(tagAttributes, TAG_PATTERNS['meta'].findall(markup)):
+        if attributes.get('name') in TOKEN_META_NAMES:
+            return attributes.get('content')
+    
+    for attributes in map(tagAttributes, TAG_PATTERNS['input'].findall(markup)):
+        # soup compares the type value as written, so HIDDEN does not count
+        if attributes.get('type') == 'hidden' and 'token' in attributes.get('name', '').lower():
+            return attributes.get('value')
+    
+    return None
+
+def soupToken(page: str) -> Optional[str]:
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        return None
+    
+    soup = BeautifulSoup(page, 'html.parser')
+    
+    for script in soup.find_all('script'):
+        if script.string:
+            for pattern in TOKEN_PATTERNS:
+                token_match = pattern.search(script.string)
+                if token_match:
+                    return token_match.group(1)
+    
+    for meta in soup.find_all('meta'):
+        if meta.get('name') in TOKEN_META_NAMES:
+            return meta.get('content')
+    
+    for inp in soup.find_all('input', type='hidden'):
+        if 'token' in inp.get('name', '').lower():
+            return inp.get('value')
+    
+    return None
+
+class BannerSession:
+    def __init__(self, base_url: str, limiter: Optional[TokenBucket] = None, metrics: Optional[Metrics] = None):
+        # the HTTP stack is only loaded once something actually talks to Banner
+        import requests
+        
         self.session = requests.Session()
-        self.base_url = "https://registrationssb.ucr.edu"
+        self.base_url = base_url
+        self.limiter = limiter
+        self.metrics = metrics or Metrics()
+        self.term = None
         self.unique_session_id = None
         self.synchronizer_token = None
+        self.created_at = 0.0
+        self.searches = 0
+        self.criteria = None
         
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br, zstd',
-            'Connection': 'keep-alive',
-            'Sec-Ch-Ua': '"Not;A=Brand";v="99", "Google Chrome";v="139", "Chromium";v="139"',
-            'Sec-Ch-Ua-Mobile': '?0',
-            'Sec-Ch-Ua-Platform': '"Windows"',
-            'Sec-Fetch-Site': 'same-origin',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Dest': 'empty',
-        })
+        self.session.headers.update(BROWSER_HEADERS)
 
-    def clear_session(self):
-        self.session.cookies.clear()
-        self.unique_session_id = None
-        self.synchronizer_token = None
+    def request(self, method: str, url: str, **kwargs):
+        if self.limiter:
+            with self.metrics.phase('rate_limit_wait'):
+                self.limiter.acquire()
+        
+        with self.metrics.phase('http'):
+            response = self.session.request(method, url, **kwargs)
+        
+        self.metrics.count('http_requests')
+        self.metrics.count('http_bytes', len(response.content))
+        return response
 
     def initialize_session(self, term="202540"):
         main_url = f"{self.base_url}/StudentRegistrationSsb"
-        self.session.get(main_url)
+        self.request('GET', main_url)
         
         term_url = f"{self.base_url}/StudentRegistrationSsb/ssb/term/termSelection?mode=search"
-        self.session.get(term_url)
+        self.request('GET', term_url)
         
         term_post_url = f"{self.base_url}/StudentRegistrationSsb/ssb/term/search"
         term_data = {
@@ -56,74 +608,32 @@ class UCRCourseScraper:
             'Referer': term_url
         }
         
-        self.session.post(term_post_url, data=term_data, headers=post_headers)
+        self.request('POST', term_post_url, data=term_data, headers=post_headers)
         
         class_search_url = f"{self.base_url}/StudentRegistrationSsb/ssb/classSearch/classSearch"
-        response = self.session.get(class_search_url)
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if script.string:
-                patterns = [
-                    r'synchronizerToken["\']?\s*[:=]\s*["\']([^"\']+)["\']',
-                    r'token["\']?\s*[:=]\s*["\']([a-f0-9-]{36})["\']',
-                    r'csrfToken["\']?\s*[:=]\s*["\']([^"\']+)["\']',
-                ]
-                
-                for pattern in patterns:
-                    token_match = re.search(pattern, script.string, re.IGNORECASE)
-                    if token_match:
-                        self.synchronizer_token = token_match.group(1)
-                        break
-                
-                if self.synchronizer_token:
-                    break
+        response = self.request('GET', class_search_url)
         
-        if not self.synchronizer_token:
-            meta_tags = soup.find_all('meta')
-            for meta in meta_tags:
-                if meta.get('name') in ['_token', 'csrf-token', 'synchronizer-token']:
-                    self.synchronizer_token = meta.get('content')
-                    break
-        
-        if not self.synchronizer_token:
-            inputs = soup.find_all('input', type='hidden')
-            for inp in inputs:
-                if 'token' in inp.get('name', '').lower():
-                    self.synchronizer_token = inp.get('value')
-                    break
+        with self.metrics.phase('token_scan'):
+            self.synchronizer_token = extractToken(response.text) or soupToken(response.text)
         
         self.unique_session_id = f"0vmfe{int(time.time() * 1000)}"
+        self.term = term
+        self.created_at = time.monotonic()
 
-    def sCourse(self, course_code, term="202540"):
-        
-        if not self.unique_session_id:
-            self.initialize_session(term)
-        
-        match = re.match(r'([A-Z]+)(\d+)([A-Z]*)', course_code.upper())
-        if not match:
-            raise ValueError("Invalid course code format. Use format like 'CS100' or 'CS010C'")
-        
-        subject = match.group(1)
-        course_num = match.group(2)
-        suffix = match.group(3)
-        full_course = f"{subject}{course_num}{suffix}"
-        
-        search_url = f"{self.base_url}/StudentRegistrationSsb/ssb/searchResults/searchResults"
-        
-        params = {
-            'txt_subjectcoursecombo': full_course,
-            'txt_term': term,
-            'startDatepicker': '',
-            'endDatepicker': '',
-            'uniqueSessionId': self.unique_session_id,
-            'pageOffset': '0',
-            'pageMaxSize': '50',
-            'sortColumn': 'subjectDescription',
-            'sortDirection': 'asc'
-        }
+    def expired(self, ttl: float) -> bool:
+        return time.monotonic() - self.created_at > ttl
+
+    def reset_search(self):
+        # Banner keeps the previous search on the server side; clear it before reusing the session
+        reset_url = f"{self.base_url}/StudentRegistrationSsb/ssb/classSearch/resetDataForm"
+        self.request('POST', reset_url, headers={'X-Synchronizer-Token': self.synchronizer_token or ''})
+
+    def search(self, path: str, params: Dict) -> Dict:
+        # further pages of the same query read the search Banner already holds; only a new query clears it
+        criteria = (path, sorted((name, str(value)) for name, value in params.items() if name not in PAGE_PARAMS))
+        if self.criteria is not None and criteria != self.criteria:
+            self.reset_search()
+        self.criteria = criteria
         
         headers = {
             'Accept': 'application/json, text/javascript, */*; q=0.01',
@@ -136,185 +646,1193 @@ class UCRCourseScraper:
         if self.synchronizer_token:
             headers['X-Synchronizer-Token'] = self.synchronizer_token
         
-        response = self.session.get(search_url, params=params, headers=headers)
+        response = self.request('GET', f"{self.base_url}{path}", params={**params, 'uniqueSessionId': self.unique_session_id}, headers=headers)
+        self.searches += 1
+        
+        if response.status_code in (401, 403):
+            raise SessionExpired(f"Search failed with status code: {response.status_code}")
         
         if response.status_code != 200:
             raise Exception(f"Search failed with status code: {response.status_code}")
         
         try:
-            data = response.json()
-            return data
-        except json.JSONDecodeError:
-            raise Exception("Invalid JSON response from server")
+            return response.json()
+        except ValueError:
+            # an expired session is answered with the HTML login page
+            raise SessionExpired("Invalid JSON response from server")
 
-    def categorizeSection(self, section_num: str, schedule_type: str) -> str:
-        schedule_type_lower = schedule_type.lower()
+class SessionPool:
+    def __init__(self, base_url: str, ttl: float = SESSION_TTL, max_idle: int = MAX_CONCURRENCY,
+                 limiter: Optional[TokenBucket] = None, metrics: Optional[Metrics] = None):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.limiter = limiter
+        self.metrics = metrics or Metrics()
+        self.max_idle = max_idle
+        self.idle: Dict[str, List[BannerSession]] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, term: str) -> BannerSession:
+        with self.lock:
+            idle = self.idle.get(term, [])
+            while idle:
+                banner = idle.pop()
+                if not banner.expired(self.ttl):
+                    self.metrics.count('sessions_reused')
+                    return banner
+        
+        banner = BannerSession(self.base_url, self.limiter, self.metrics)
+        with self.metrics.phase('session_setup'):
+            banner.initialize_session(term)
+        with self.metrics.phase('session_settle'):
+            time.sleep(SESSION_SETTLE_SECONDS)
+        self.metrics.count('sessions_created')
+        return banner
+
+    def release(self, banner: BannerSession):
+        if banner.expired(self.ttl):
+            return
         
+        with self.lock:
+            idle = self.idle.setdefault(banner.term, [])
+            if len(idle) < self.max_idle:
+                idle.append(banner)
+
+    @contextlib.contextmanager
+    def lease(self, term: str) -> Iterator[BannerSession]:
+        banner = self.acquire(term)
         try:
-            section_int = int(section_num)
-        except:
-            section_int = 0
+            yield banner
+        except SessionExpired:
+            raise
+        except BaseException:
+            self.release(banner)
+            raise
+        self.release(banner)
+
+    def invalidate(self, term: Optional[str] = None):
+        with self.lock:
+            if term is None:
+                self.idle.clear()
+            else:
+                self.idle.pop(term, None)
+
+class SectionCatalog:
+    def __init__(self, path: str = CATALOG_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
         
-        if 'lecture' in schedule_type_lower and 'lab' not in schedule_type_lower:
-            return 'lecture'
-        elif 'lab' in schedule_type_lower:
-            return 'lab'  
-        elif 'discussion' in schedule_type_lower or 'disc' in schedule_type_lower:
-            return 'discussion'
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS courses (
+                term TEXT NOT NULL,
+                course_code TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                ttl REAL NOT NULL,
+                version INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                invalidated INTEGER NOT NULL DEFAULT 0,
+                seats_version INTEGER NOT NULL DEFAULT 0,
+                seats_at REAL,
+                PRIMARY KEY (term, course_code)
+            );
+            CREATE TABLE IF NOT EXISTS sections (
+                term TEXT NOT NULL,
+                course_code TEXT NOT NULL,
+                crn TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (term, course_code, crn)
+            );
+            CREATE INDEX IF NOT EXISTS sections_by_crn ON sections (term, crn);
+            CREATE TABLE IF NOT EXISTS compat (
+                rows_digest TEXT NOT NULL,
+                columns_digest TEXT NOT NULL,
+                rows_course TEXT NOT NULL,
+                columns_course TEXT NOT NULL,
+                bits TEXT NOT NULL,
+                used_at REAL NOT NULL,
+                PRIMARY KEY (rows_digest, columns_digest)
+            );
+            CREATE TABLE IF NOT EXISTS harvest_staging (
+                term TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                course_code TEXT NOT NULL,
+                crn TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (term, subject, course_code, crn)
+            );
+        """)
         
-        if section_int > 0:
-            if section_int <= 9:
-                return 'lecture'
-            elif 10 <= section_int <= 19:
-                if section_int <= 15:
-                    return 'lecture'
-                else:
-                    return 'discussion'
-            elif 20 <= section_int <= 29:
-                if section_int <= 24:
-                    return 'lab'
-                else:
-                    return 'discussion'
-            else:
-                return 'discussion'
+        # catalogs written before seat refreshes existed lack the seat columns
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(courses)")}
+        with self.db:
+            if 'seats_version' not in columns:
+                self.db.execute("ALTER TABLE courses ADD COLUMN seats_version INTEGER NOT NULL DEFAULT 0")
+            if 'seats_at' not in columns:
+                self.db.execute("ALTER TABLE courses ADD COLUMN seats_at REAL")
+
+    def get(self, term: str, course_code: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT fetched_at, ttl, version, invalidated, seats_version FROM courses WHERE term = ? AND course_code = ?",
+                (term, course_code)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            payloads = self.db.execute(
+                "SELECT payload FROM sections WHERE term = ? AND course_code = ? ORDER BY position",
+                (term, course_code)
+            ).fetchall()
         
-        return 'lecture'
+        fetched_at, ttl, version, invalidated, seats_version = row
+        
+        return {
+            'sections': [json.loads(payload) for (payload,) in payloads],
+            'fetched_at': fetched_at,
+            'version': version,
+            'seats_version': seats_version,
+            'invalidated': bool(invalidated),
+            'fresh': not invalidated and time.time() - fetched_at <= ttl
+        }
 
-    def format_time(self, time_str: str) -> str:
-        if not time_str or len(time_str) != 4:
-            return "TBA"
+    def status(self, term: str, course_code: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT fetched_at, ttl, version, invalidated, seats_version FROM courses WHERE term = ? AND course_code = ?",
+                (term, course_code)
+            ).fetchone()
         
-        try:
-            hour = int(time_str[:2])
-            minute = time_str[2:]
+        if row is None:
+            return None
+        
+        fetched_at, ttl, version, invalidated, seats_version = row
+        return {
+            'version': version,
+            'seats_version': seats_version,
+            'expires_at': fetched_at + ttl,
+            'invalidated': bool(invalidated),
+            'fresh': not invalidated and time.time() - fetched_at <= ttl
+        }
+
+    def put(self, term: str, course_code: str, sections: List[Dict], ttl: float = CATALOG_TTL) -> int:
+        records = [{key: value for key, value in section.items() if key != 'week_mask'} for section in sections]
+        # seat counts are left out so that enrollment churn never looks like a structural change
+        digest = hashlib.sha1(json.dumps([{key: value for key, value in record.items() if key != 'enrollment'}
+                                          for record in records], sort_keys=True).encode()).hexdigest()
+        
+        with self.lock, self.db:
+            row = self.db.execute(
+                "SELECT version, digest, seats_version FROM courses WHERE term = ? AND course_code = ?",
+                (term, course_code)
+            ).fetchone()
             
-            if hour == 0:
-                formatted_time = f"12:{minute} AM"
-            elif hour < 12:
-                formatted_time = f"{hour}:{minute} AM"
-            elif hour == 12:
-                formatted_time = f"12:{minute} PM"
-            else:
-                formatted_time = f"{hour - 12}:{minute} PM"
+            version, seats_version = (row[0], row[2]) if row else (0, 0)
+            if row is None or row[1] != digest:
+                version += 1
+                seats_version += 1
+                self.db.execute("DELETE FROM sections WHERE term = ? AND course_code = ?", (term, course_code))
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO sections (term, course_code, crn, position, payload) VALUES (?, ?, ?, ?, ?)",
+                    [(term, course_code, record['crn'], position, json.dumps(record)) for position, record in enumerate(records)]
+                )
+            elif self.patchSeats(term, {record['crn']: record['enrollment'] for record in records}):
+                seats_version += 1
             
-            return formatted_time
-        except ValueError:
-            return "TBA"
+            now = time.time()
+            self.db.execute(
+                "INSERT OR REPLACE INTO courses (term, course_code, fetched_at, ttl, version, digest, invalidated, seats_version, seats_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (term, course_code, now, ttl, version, digest, seats_version, now)
+            )
+        
+        return version
 
-    def parseMin(self, time_str: str) -> int:
-        if not time_str or time_str == "TBA" or len(time_str) != 4:
-            return -1
+    def patchSeats(self, term: str, seats: Dict[str, Dict]) -> Dict[str, int]:
+        # callers hold the lock and the transaction; returns changed section counts per course
+        changed: Dict[str, int] = {}
+        updates = []
+        crns = list(seats)
         
-        try:
-            hour = int(time_str[:2])
-            minute = int(time_str[2:])
-            return hour * 60 + minute
-        except ValueError:
-            return -1
+        for start in range(0, len(crns), 500):
+            chunk = crns[start:start + 500]
+            rows = self.db.execute(
+                f"SELECT course_code, crn, payload FROM sections WHERE term = ? AND crn IN ({', '.join('?' for _ in chunk)})",
+                [term, *chunk]
+            ).fetchall()
+            for course_code, crn, payload in rows:
+                record = json.loads(payload)
+                if record['enrollment'] == seats[crn]:
+                    continue
+                record['enrollment'] = seats[crn]
+                updates.append((json.dumps(record), term, course_code, crn))
+                changed[course_code] = changed.get(course_code, 0) + 1
+        
+        self.db.executemany("UPDATE sections SET payload = ? WHERE term = ? AND course_code = ? AND crn = ?", updates)
+        return changed
 
-    def extractMeeting(self, course_data: Dict) -> Dict:
-        meeting_details = {
-            'schedule': 'TBA',
-            'location': 'TBA',
-            'days_list': [],
-            'start_time_minutes': -1,
-            'end_time_minutes': -1,
-            'raw_start_time': '',
-            'raw_end_time': ''
-        }
+    def updateSeats(self, term: str, seats: Dict[str, Dict], courses: List[str]) -> Dict[str, int]:
+        with self.lock, self.db:
+            changed = self.patchSeats(term, seats)
+            now = time.time()
+            self.db.executemany(
+                "UPDATE courses SET seats_version = seats_version + ?, seats_at = ? WHERE term = ? AND course_code = ?",
+                [(1 if course_code in changed else 0, now, term, course_code) for course_code in courses]
+            )
         
-        if not course_data.get('meetingsFaculty'):
-            return meeting_details
+        return changed
+
+    def courseCodes(self, term: str) -> List[str]:
+        with self.lock:
+            rows = self.db.execute("SELECT course_code FROM courses WHERE term = ? ORDER BY course_code", (term,)).fetchall()
         
-        for meeting in course_data['meetingsFaculty']:
-            if meeting.get('meetingTime'):
-                mt = meeting['meetingTime']
-                
-                days = []
-                days_map = {
-                    'monday': 'M', 'tuesday': 'T', 'wednesday': 'W',
-                    'thursday': 'R', 'friday': 'F', 'saturday': 'S', 'sunday': 'U'
-                }
-                
-                for day, abbrev in days_map.items():
-                    if mt.get(day):
-                        days.append(abbrev)
-                
-                raw_start_time = mt.get('beginTime', '')
-                raw_end_time = mt.get('endTime', '')
-                
-                begin_time = self.format_time(raw_start_time)
-                end_time = self.format_time(raw_end_time)
-                
-                building = mt.get('buildingDescription', 'TBA')
-                room = mt.get('room', '')
-                location = f"{building} {room}".strip() if room else building
-                
-                day_str = ''.join(days) if days else 'TBA'
-                time_str = f"{begin_time} - {end_time}" if begin_time != "TBA" and end_time != "TBA" else "TBA"
-                schedule = f"{day_str} {time_str}" if day_str != 'TBA' or time_str != 'TBA' else 'TBA'
-                
-                meeting_details.update({
-                    'schedule': schedule,
-                    'location': location,
-                    'days_list': days,
-                    'raw_start_time': raw_start_time,
-                    'raw_end_time': raw_end_time,
-                    'start_time_minutes': self.parseMin(raw_start_time),
-                    'end_time_minutes': self.parseMin(raw_end_time)
-                })
-                break
+        return [course_code for (course_code,) in rows]
+
+    def crnCourses(self, term: str, crns: List[str]) -> Dict[str, str]:
+        found = {}
         
-        return meeting_details
+        with self.lock:
+            for start in range(0, len(crns), 500):
+                chunk = crns[start:start + 500]
+                found.update(self.db.execute(
+                    f"SELECT crn, course_code FROM sections WHERE term = ? AND crn IN ({', '.join('?' for _ in chunk)})",
+                    [term, *chunk]
+                ).fetchall())
+        
+        return found
 
-    def linkCourse(self, course_code: str, term: str = "202540") -> Dict:
+    def stageSections(self, term: str, subject: str, sections: List[Dict], offset: int):
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO harvest_staging (term, subject, course_code, crn, position, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                [(term, subject, section['course_code'], section['crn'], offset + i, json.dumps(section))
+                 for i, section in enumerate(sections)]
+            )
+
+    def clearStaged(self, term: str, subject: str):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM harvest_staging WHERE term = ? AND subject = ?", (term, subject))
+
+    def commitStaged(self, term: str, subject: str, ttl: float = CATALOG_TTL) -> int:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT course_code, payload FROM harvest_staging WHERE term = ? AND subject = ? ORDER BY position",
+                (term, subject)
+            ).fetchall()
+        
+        courses: Dict[str, List[Dict]] = {}
+        for course_code, payload in rows:
+            courses.setdefault(course_code, []).append(json.loads(payload))
+        
+        for course_code, sections in courses.items():
+            self.put(term, course_code, sections, ttl)
+        
+        self.clearStaged(term, subject)
+        return len(courses)
+
+    def getCompat(self, rows_digest: str, columns_digest: str) -> Optional[List[int]]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT bits FROM compat WHERE rows_digest = ? AND columns_digest = ?",
+                (rows_digest, columns_digest)
+            ).fetchone()
+        
+        return [int(bits, 16) for bits in json.loads(row[0])] if row else None
+
+    def putCompat(self, rows_digest: str, columns_digest: str, rows_course: str, columns_course: str,
+                  compat: List[int], max_rows: int = COMPAT_CATALOG_ROWS):
+        # matrices are addressed by the class masks they were built from, so they never go stale;
+        # the table is only trimmed to keep constraint variants from piling up
+        bits = json.dumps([format(row, 'x') for row in compat])
+        
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO compat (rows_digest, columns_digest, rows_course, columns_course, bits, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (rows_digest, columns_digest, rows_course, columns_course, bits, time.time())
+            )
+            self.db.execute(
+                "DELETE FROM compat WHERE rowid IN (SELECT rowid FROM compat ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (max_rows,)
+            )
+
+    def version(self, term: str, course_code: str) -> int:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT version FROM courses WHERE term = ? AND course_code = ?",
+                (term, course_code)
+            ).fetchone()
+        
+        return row[0] if row else 0
+
+    def invalidate(self, term: Optional[str] = None, courses: Optional[List[str]] = None) -> int:
+        query = "UPDATE courses SET invalidated = 1"
+        clauses = []
+        params = []
+        
+        if term:
+            clauses.append("term = ?")
+            params.append(term)
+        if courses:
+            clauses.append(f"course_code IN ({', '.join('?' for _ in courses)})")
+            params.extend(course.upper() for course in courses)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        
+        with self.lock, self.db:
+            return self.db.execute(query, params).rowcount
+
+class ResultCache:
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES, disk_path: Optional[str] = None,
+                 disk_bytes: int = RESULT_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_bytes = disk_bytes
+        self.entries: 'OrderedDict[str, Tuple[Dict, bytes]]' = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.db = None
+        
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self.db = sqlite3.connect(disk_path, check_same_thread=False)
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    versions TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def key(command: str, term: str, course_list: List[str], spec: Dict) -> str:
+        request = {'command': command, 'term': term, 'courses': sorted(code.upper() for code in course_list), **spec}
+        return hashlib.sha1(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str, versions: Dict[str, int]) -> Optional[Tuple[Dict, str]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] == versions:
+                    self.entries.move_to_end(key)
+                    return json.loads(entry[1]), 'memory'
+                self.dropMemory(key)
+            
+            if self.db is None:
+                return None
+            
+            row = self.db.execute("SELECT versions, payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if json.loads(row[0]) != versions:
+                with self.db:
+                    self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            
+            with self.db:
+                self.db.execute("UPDATE results SET used_at = ? WHERE key = ?", (time.time(), key))
+            payload = zlib.decompress(row[1])
+            self.remember(key, versions, payload)
+            return json.loads(payload), 'disk'
+
+    def put(self, key: str, versions: Dict[str, int], result: Dict):
+        payload = json.dumps(result, separators=COMPACT_SEPARATORS).encode()
+        
+        with self.lock:
+            self.remember(key, versions, payload)
+            
+            if self.db is None:
+                return
+            
+            compressed = zlib.compress(payload)
+            if len(compressed) > self.disk_bytes:
+                return
+            
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO results (key, versions, payload, size, used_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(versions, sort_keys=True), compressed, len(compressed), time.time())
+                )
+                total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                for old_key, size in self.db.execute("SELECT key, size FROM results ORDER BY used_at").fetchall():
+                    if total <= self.disk_bytes:
+                        break
+                    self.db.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                    total -= size
+
+    def remember(self, key: str, versions: Dict[str, int], payload: bytes):
+        if len(payload) > self.max_bytes:
+            return
+        
+        self.dropMemory(key)
+        self.entries[key] = (versions, payload)
+        self.size += len(payload)
+        
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def dropMemory(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            if self.db is not None:
+                with self.db:
+                    self.db.execute("DELETE FROM results")
+
+class PlanSession:
+    def __init__(self, term: str, constraints: Optional[Dict] = None):
+        self.term = term
+        self.constraints = constraints
+        self.rules = ScheduleConstraints(constraints) if constraints else None
+        self.courses: List[Dict] = []
+        # levels[k] holds every conflict-free (occupied, classes) partial over courses[:k + 1]
+        self.levels: List[List[Tuple[int, Tuple[Dict, ...]]]] = []
+
+    def codes(self) -> List[str]:
+        return [course['course_code'] for course in self.courses]
+
+    def position(self, course_code: str) -> Optional[int]:
+        for i, course in enumerate(self.courses):
+            if course['course_code'] == course_code:
+                return i
+        return None
+
+    def remove(self, course_code: str):
+        i = self.position(course_code)
+        if i is not None:
+            del self.courses[i]
+            del self.levels[i:]
+
+    def replace(self, course: Dict):
+        i = self.position(course['course_code'])
+        self.courses[i] = course
+        del self.levels[i:]
+
+    def partials(self) -> int:
+        return sum(len(level) for level in self.levels)
+
+    def extend(self, stats: Dict, max_partials: int = PLAN_PARTIAL_LIMIT) -> bool:
+        partials = self.levels[-1] if self.levels else [(0, ())]
+        budget = max_partials - self.partials()
+        
+        for course in self.courses[len(self.levels):]:
+            extended = []
+            for occupied, classes in partials:
+                for group in course['usable']:
+                    stats['nodes_visited'] += 1
+                    if group['mask'] & occupied:
+                        stats['branches_pruned'] += 1
+                        continue
+                    extended.append((occupied | group['mask'], classes + (group,)))
+                    # a level over budget is never kept, so stop building it right away
+                    if len(extended) > budget:
+                        return False
+            
+            self.levels.append(extended)
+            budget -= len(extended)
+            partials = extended
+        
+        return True
+
+    def schedules(self) -> List[Tuple[Dict, ...]]:
+        return [classes for _, classes in self.levels[-1]] if self.courses else []
+
+class BannerSource:
+    live = True
+
+    def __init__(self, scraper: 'UCRCourseScraper', record_dir: Optional[str] = None):
+        self.scraper = scraper
+        self.record_dir = record_dir
+
+    def searchResults(self, course_code: str, term: str) -> Dict:
+        course_data = self.scraper.sCourse(course_code, term)
+        
+        if self.record_dir and course_data is not None:
+            path = os.path.join(self.record_dir, term, f"{course_code.upper()}.json")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(course_data, f)
+        
+        return course_data
+
+class ReplaySource:
+    live = False
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def searchResults(self, course_code: str, term: str) -> Dict:
+        course_code = course_code.upper()
+        
+        for path in (os.path.join(self.directory, term, f"{course_code}.json"),
+                     os.path.join(self.directory, f"{course_code}.json")):
+            if os.path.exists(path):
+                with open(path) as f:
+                    recorded = json.load(f)
+                break
+        else:
+            return {'success': True, 'totalCount': 0, 'data': []}
+        
+        # a recording may hold the merged response or the individual pages
+        if isinstance(recorded, list):
+            pages = recorded
+            recorded = {**pages[0], 'data': [row for page in pages for row in page.get('data') or []]} if pages else {'success': True, 'data': []}
+        
+        return recorded
+
+def fixtureTime(value: Optional[str]) -> str:
+    return value.replace(':', '').zfill(4) if value else ''
+
+class FixtureSource:
+    live = False
+    SCHEDULE_TYPES = {'LEC': 'Lecture', 'LAB': 'Laboratory', 'DIS': 'Discussion'}
+    FIRST_SECTION = {'LEC': 1, 'LAB': 21, 'DIS': 31}
+
+    def __init__(self, path: str):
+        with open(path) as f:
+            entries = json.load(f)
+        
+        self.courses: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            self.courses.setdefault(f"{entry['subject']}{entry['code']}".upper(), []).append(entry)
+
+    def bannerRow(self, entry: Dict, sequence: str) -> Dict:
+        kind = entry.get('type', 'LEC').upper()
+        days = set(entry.get('days') or '')
+        seats = entry.get('seats', 0)
+        
+        return {
+            'courseReferenceNumber': str(entry['crn']),
+            'courseTitle': entry.get('title', f"{entry['subject']} {entry['code']}"),
+            'subject': entry['subject'],
+            'courseNumber': entry['code'],
+            'sequenceNumber': sequence,
+            'scheduleTypeDescription': self.SCHEDULE_TYPES.get(kind, kind.title()),
+            'enrollment': entry.get('enrolled', 0),
+            'maximumEnrollment': entry.get('capacity', seats),
+            'seatsAvailable': seats,
+            'faculty': [{'displayName': entry['prof']}] if entry.get('prof') else [],
+            'meetingsFaculty': [{
+                'meetingTime': {
+                    **{day: abbrev in days for day, abbrev in (('monday', 'M'), ('tuesday', 'T'), ('wednesday', 'W'),
+                                                               ('thursday', 'R'), ('friday', 'F'), ('saturday', 'S'),
+                                                               ('sunday', 'U'))},
+                    # a missing time stays empty so the section reads as TBA, not a midnight meeting
+                    'beginTime': fixtureTime(entry.get('start')),
+                    'endTime': fixtureTime(entry.get('end')),
+                    'buildingDescription': entry.get('location', 'TBA'),
+                    'room': ''
+                }
+            }]
+        }
+
+    def searchResults(self, course_code: str, term: str) -> Dict:
+        rows = []
+        counters = dict(self.FIRST_SECTION)
+        
+        # fixtures carry no section numbers, so number them the way Banner does per schedule type
+        for entry in self.courses.get(course_code.upper(), []):
+            kind = entry.get('type', 'LEC').upper()
+            sequence = entry.get('section') or f"{counters.get(kind, 1):03d}"
+            counters[kind] = counters.get(kind, 1) + 1
+            rows.append(self.bannerRow(entry, sequence))
+        
+        return {'success': True, 'totalCount': len(rows), 'data': rows}
+
+class UCRCourseScraper:
+    def __init__(self, session_ttl: float = SESSION_TTL, max_concurrency: int = MAX_CONCURRENCY,
+                 rate_limit: float = RATE_LIMIT, rate_burst: int = RATE_BURST,
+                 catalog_path: Optional[str] = CATALOG_PATH, cache_ttl: float = CATALOG_TTL,
+                 stale_while_revalidate: bool = False, offline: bool = False, processes: int = 1,
+                 source: Optional[Union[str, BannerSource, ReplaySource, FixtureSource]] = None,
+                 record_dir: Optional[str] = None, base_url: str = BANNER_URL,
+                 result_cache: Optional[ResultCache] = None, cache_results: bool = True,
+                 popularity_log: Optional[str] = None):
+        self.base_url = base_url
+        self.source = self.openSource(source, record_dir)
+        self.catalog = SectionCatalog(catalog_path) if catalog_path else None
+        self.cache_ttl = cache_ttl
+        # results are only reusable while the catalog can vouch for the section data behind them
+        self.result_cache = (result_cache or ResultCache()) if self.catalog is not None and cache_results else None
+        self.stale_while_revalidate = stale_while_revalidate
+        self.offline = offline
+        self.popularity_log = popularity_log
+        self.popularity_lock = threading.Lock()
+        self.plans: 'OrderedDict[str, PlanSession]' = OrderedDict()
+        self.compat_cache: 'OrderedDict[Tuple[str, str], List[int]]' = OrderedDict()
+        self.compat_lock = threading.Lock()
+        self.processes = max(1, processes)
+        self.process_pool: Optional['ProcessPoolExecutor'] = None
+        self.refreshing: Dict[Tuple[str, str], threading.Thread] = {}
+        self.refresh_lock = threading.Lock()
+        self.max_concurrency = max(1, max_concurrency)
+        self.limiter = TokenBucket(rate_limit, rate_burst)
+        self.metrics = Metrics()
+        self.session_pool = SessionPool(self.base_url, ttl=session_ttl, max_idle=self.max_concurrency,
+                                        limiter=self.limiter, metrics=self.metrics)
+
+    def openSource(self, source, record_dir: Optional[str] = None):
+        if source is None or source == 'banner':
+            return BannerSource(self, record_dir)
+        if not isinstance(source, str):
+            return source
+        if os.path.isdir(source):
+            return ReplaySource(source)
+        if os.path.isfile(source):
+            return FixtureSource(source)
+        
+        raise ValueError(f"Unknown section source: {source}")
+
+    def bannerGet(self, term: str, path: str, params: Dict) -> Dict:
         try:
-            self.clear_session()
-            self.initialize_session(term)
-            time.sleep(1)
+            with self.session_pool.lease(term) as banner:
+                return banner.search(path, params)
+        except SessionExpired:
+            pass
+        
+        with self.session_pool.lease(term) as banner:
+            return banner.search(path, params)
+
+    def sCourse(self, course_code, term="202540"):
+        
+        match = re.match(r'([A-Z]+)(\d+)([A-Z]*)', course_code.upper())
+        if not match:
+            raise ValueError("Invalid course code format. Use format like 'CS100' or 'CS010C'")
+        
+        subject = match.group(1)
+        course_num = match.group(2)
+        suffix = match.group(3)
+        full_course = f"{subject}{course_num}{suffix}"
+        
+        params = {
+            'txt_subjectcoursecombo': full_course,
+            'txt_term': term,
+            'startDatepicker': '',
+            'endDatepicker': '',
+            'sortColumn': 'subjectDescription',
+            'sortDirection': 'asc'
+        }
+        
+        course_data = None
+        for page in self.searchPages(term, params):
+            if course_data is None:
+                course_data = page
+            else:
+                course_data['data'].extend(page.get('data') or [])
+        
+        return course_data
+
+    def searchPages(self, term: str, params: Dict, offset: int = 0, page_size: int = SEARCH_PAGE_SIZE) -> Iterator[Dict]:
+        while True:
+            page = self.bannerGet(term, "/StudentRegistrationSsb/ssb/searchResults/searchResults", {
+                **params,
+                'pageOffset': str(offset),
+                'pageMaxSize': str(page_size)
+            })
+            rows = page.get('data') or []
+            offset += len(rows)
+            page['pageOffset'] = offset
+            yield page
+            
+            if not rows or offset >= (page.get('totalCount') or 0):
+                break
+
+    def termSubjects(self, term: str) -> List[str]:
+        subjects = self.bannerGet(term, "/StudentRegistrationSsb/ssb/classSearch/get_subject", {
+            'searchTerm': '',
+            'term': term,
+            'offset': '1',
+            'max': '1000'
+        })
+        return [subject['code'] for subject in subjects]
+
+    def harvestTerm(self, term: str, subjects: Optional[List[str]] = None, checkpoint_path: Optional[str] = None,
+                    progress=None) -> Dict:
+        if self.catalog is None:
+            raise Exception("Harvesting needs the section cache")
+        if not self.source.live:
+            raise Exception("Harvesting needs the live Banner source")
+        
+        checkpoint_path = checkpoint_path or os.path.join(os.path.dirname(os.path.abspath(self.catalog.path)), f"harvest-{term}.json")
+        checkpoint = {'term': term, 'subjects': None, 'done': [], 'current': None, 'offset': 0}
+        
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                saved = json.load(f)
+            if saved.get('term') == term and (subjects is None or saved.get('subjects') == subjects):
+                checkpoint = saved
+        
+        if checkpoint['subjects'] is None:
+            checkpoint['subjects'] = subjects or self.termSubjects(term)
+        
+        def save():
+            tmp_path = checkpoint_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, checkpoint_path)
+        
+        harvested = 0
+        for subject in checkpoint['subjects']:
+            if subject in checkpoint['done']:
+                continue
+            
+            offset = checkpoint['offset'] if checkpoint['current'] == subject else 0
+            if offset == 0:
+                self.catalog.clearStaged(term, subject)
+            
+            checkpoint['current'] = subject
+            params = {
+                'txt_subject': subject,
+                'txt_term': term,
+                'startDatepicker': '',
+                'endDatepicker': '',
+                'sortColumn': 'subjectDescription',
+                'sortDirection': 'asc'
+            }
+            
+            for page in self.searchPages(term, params, offset=offset):
+                rows = page.get('data') or []
+                self.catalog.stageSections(term, subject, [self.normalizeSection(row) for row in rows], offset)
+                harvested += len(rows)
+                offset = page['pageOffset']
+                checkpoint['offset'] = offset
+                save()
+                
+                if progress:
+                    progress({
+                        'subject': subject,
+                        'sections': offset,
+                        'total': page.get('totalCount') or 0,
+                        'subjects_done': len(checkpoint['done']),
+                        'subjects_total': len(checkpoint['subjects'])
+                    })
+            
+            self.catalog.commitStaged(term, subject, self.cache_ttl)
+            checkpoint['done'].append(subject)
+            checkpoint['current'] = None
+            checkpoint['offset'] = 0
+            save()
+        
+        # nothing is written when there was no subject to harvest
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        
+        return {
+            'success': True,
+            'term': term,
+            'subjects': len(checkpoint['subjects']),
+            'sections_harvested': harvested
+        }
+
+    def categorizeSection(self, section_num: str, schedule_type: str) -> str:
+        schedule_type_lower = schedule_type.lower()
+        
+        try:
+            section_int = int(section_num)
+        except:
+            section_int = 0
+        
+        if 'lecture' in schedule_type_lower and 'lab' not in schedule_type_lower:
+            return 'lecture'
+        elif 'lab' in schedule_type_lower:
+            return 'lab'  
+        elif 'discussion' in schedule_type_lower or 'disc' in schedule_type_lower:
+            return 'discussion'
+        
+        if section_int > 0:
+            if section_int <= 9:
+                return 'lecture'
+            elif 10 <= section_int <= 19:
+                if section_int <= 15:
+                    return 'lecture'
+                else:
+                    return 'discussion'
+            elif 20 <= section_int <= 29:
+                if section_int <= 24:
+                    return 'lab'
+                else:
+                    return 'discussion'
+            else:
+                return 'discussion'
+        
+        return 'lecture'
+
+    def format_time(self, time_str: str) -> str:
+        if not time_str or len(time_str) != 4:
+            return "TBA"
+        
+        try:
+            hour = int(time_str[:2])
+            minute = time_str[2:]
             
-            course_data = self.sCourse(course_code, term)
+            if hour == 0:
+                formatted_time = f"12:{minute} AM"
+            elif hour < 12:
+                formatted_time = f"{hour}:{minute} AM"
+            elif hour == 12:
+                formatted_time = f"12:{minute} PM"
+            else:
+                formatted_time = f"{hour - 12}:{minute} PM"
             
-            if not course_data.get('success') or not course_data.get('data'):
+            return formatted_time
+        except ValueError:
+            return "TBA"
+
+    def parseMin(self, time_str: str) -> int:
+        if not time_str or time_str == "TBA" or len(time_str) != 4:
+            return -1
+        
+        try:
+            hour = int(time_str[:2])
+            minute = int(time_str[2:])
+            return hour * 60 + minute
+        except ValueError:
+            return -1
+
+    def extractMeeting(self, course_data: Dict) -> Dict:
+        meeting_details = {
+            'schedule': 'TBA',
+            'location': 'TBA',
+            'days_list': [],
+            'start_time_minutes': -1,
+            'end_time_minutes': -1,
+            'raw_start_time': '',
+            'raw_end_time': ''
+        }
+        
+        if not course_data.get('meetingsFaculty'):
+            return meeting_details
+        
+        for meeting in course_data['meetingsFaculty']:
+            if meeting.get('meetingTime'):
+                mt = meeting['meetingTime']
+                
+                days = []
+                days_map = {
+                    'monday': 'M', 'tuesday': 'T', 'wednesday': 'W',
+                    'thursday': 'R', 'friday': 'F', 'saturday': 'S', 'sunday': 'U'
+                }
+                
+                for day, abbrev in days_map.items():
+                    if mt.get(day):
+                        days.append(abbrev)
+                
+                raw_start_time = mt.get('beginTime', '')
+                raw_end_time = mt.get('endTime', '')
+                
+                begin_time = self.format_time(raw_start_time)
+                end_time = self.format_time(raw_end_time)
+                
+                building = mt.get('buildingDescription', 'TBA')
+                room = mt.get('room', '')
+                location = f"{building} {room}".strip() if room else building
+                
+                day_str = ''.join(days) if days else 'TBA'
+                time_str = f"{begin_time} - {end_time}" if begin_time != "TBA" and end_time != "TBA" else "TBA"
+                schedule = f"{day_str} {time_str}" if day_str != 'TBA' or time_str != 'TBA' else 'TBA'
+                
+                meeting_details.update({
+                    'schedule': schedule,
+                    'location': location,
+                    'days_list': days,
+                    'raw_start_time': raw_start_time,
+                    'raw_end_time': raw_end_time,
+                    'start_time_minutes': self.parseMin(raw_start_time),
+                    'end_time_minutes': self.parseMin(raw_end_time)
+                })
+                break
+        
+        return meeting_details
+
+    def normalizeSection(self, section: Dict) -> Dict:
+        schedule_type = section.get('scheduleTypeDescription', '').lower()
+        meeting_details = self.extractMeeting(section)
+        section_num = section['sequenceNumber']
+        
+        categorized_type = self.categorizeSection(section_num, schedule_type)
+        
+        return {
+            'crn': section['courseReferenceNumber'],
+            'course_title': section['courseTitle'],
+            'course_code': f"{section['subject']}{section['courseNumber']}",
+            'section': section_num,
+            'schedule_type': section.get('scheduleTypeDescription', 'Unknown'),
+            'categorized_type': categorized_type,
+            'enrollment': self.seatCounts(section),
+            'instructors': [f.get('displayName', 'TBA') for f in section.get('faculty', [])],
+            'schedule': meeting_details['schedule'],
+            'location': meeting_details['location'],
+            'days_list': meeting_details['days_list'],
+            'start_time_minutes': meeting_details['start_time_minutes'],
+            'end_time_minutes': meeting_details['end_time_minutes'],
+            'raw_start_time': meeting_details['raw_start_time'],
+            'raw_end_time': meeting_details['raw_end_time']
+        }
+
+    def seatCounts(self, section: Dict) -> Dict:
+        return {
+            'current': section['enrollment'],
+            'maximum': section['maximumEnrollment'],
+            'available': section['seatsAvailable']
+        }
+
+    def fetchSections(self, course_code: str, term: str = "202540") -> List[Dict]:
+        with self.metrics.phase('fetch'):
+            course_data = self.source.searchResults(course_code, term)
+        
+        if not course_data or not course_data.get('success') or not course_data.get('data'):
+            return []
+        
+        with self.metrics.phase('parse'):
+            return [self.normalizeSection(section) for section in course_data['data']]
+
+    def refreshSections(self, course_code: str, term: str) -> List[Dict]:
+        sections = self.fetchSections(course_code, term)
+        self.catalog.put(term, course_code, sections, self.cache_ttl)
+        return sections
+
+    def refreshSeats(self, term: str = "202540", courses: Optional[List[str]] = None,
+                     crns: Optional[List[str]] = None) -> Dict:
+        if self.catalog is None:
+            raise Exception("Seat refresh needs the section cache")
+        
+        self.metrics.reset()
+        crns = [str(crn) for crn in crns or []]
+        owners = self.catalog.crnCourses(term, crns) if crns else {}
+        wanted = list(dict.fromkeys([code.upper() for code in courses or []] + list(owners.values())))
+        if not courses and not crns:
+            wanted = self.catalog.courseCodes(term)
+        
+        with self.metrics.phase('fetch'):
+            seats = self.seatRows(term, wanted)
+        
+        with self.metrics.phase('seats_update'):
+            changed = self.catalog.updateSeats(term, seats, wanted)
+            patched = self.patchPlanSeats(term, seats)
+        
+        return {
+            'success': True,
+            'term': term,
+            'courses_refreshed': len(wanted),
+            'sections_refreshed': len(seats),
+            'sections_changed': sum(changed.values()),
+            'courses_changed': sorted(changed),
+            'plan_sections_patched': patched,
+            'missing_crns': sorted(set(crns) - set(owners)),
+            'metrics': self.metrics.toDict()
+        }
+
+    def seatRows(self, term: str, courses: List[str]) -> Dict[str, Dict]:
+        wanted = set(courses)
+        
+        if self.source.live:
+            # one subject query returns a whole department a page at a time, which beats
+            # a query per course as soon as two courses share a subject
+            bySubject: Dict[str, List[str]] = {}
+            for course_code in courses:
+                match = re.match(r'[A-Z]+', course_code)
+                if match:
+                    bySubject.setdefault(match.group(0), []).append(course_code)
+            
+            queries = [{'txt_subject': subject} if len(codes) > 1 else {'txt_subjectcoursecombo': codes[0]}
+                       for subject, codes in bySubject.items()]
+            
+            def fetch(query):
+                params = {**query, 'txt_term': term, 'startDatepicker': '', 'endDatepicker': '',
+                          'sortColumn': 'subjectDescription', 'sortDirection': 'asc'}
+                return [row for page in self.searchPages(term, params) for row in page.get('data') or []]
+            
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, max(1, len(queries)))) as executor:
+                pages = list(executor.map(fetch, queries))
+        else:
+            pages = [(self.source.searchResults(course_code, term) or {}).get('data') or [] for course_code in courses]
+        
+        return {
+            row['courseReferenceNumber']: self.seatCounts(row)
+            for rows in pages for row in rows
+            if f"{row['subject']}{row['courseNumber']}".upper() in wanted
+        }
+
+    def patchPlanSeats(self, term: str, seats: Dict[str, Dict]) -> int:
+        # plans keep linked Section objects alive; their Enrollment is the one mutable part
+        patched = 0
+        for plan in list(self.plans.values()):
+            if plan.term != term:
+                continue
+            for course in plan.courses:
+                for section in course['sections']:
+                    counts = seats.get(section.crn)
+                    if counts is not None:
+                        section.enrollment.current = counts['current']
+                        section.enrollment.maximum = counts['maximum']
+                        section.enrollment.available = counts['available']
+                        patched += 1
+        return patched
+
+    def recordDemand(self, term: str, course_list: List[str]):
+        if not self.popularity_log:
+            return
+        
+        line = json.dumps({'at': round(time.time()), 'term': term,
+                           'courses': sorted({code.upper() for code in course_list})}, separators=COMPACT_SEPARATORS)
+        with self.popularity_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.popularity_log)), exist_ok=True)
+            with open(self.popularity_log, 'a') as f:
+                f.write(line + '\n')
+
+    def warmCourses(self, term: str, courses: List[str], pairs: Optional[List[Tuple[str, str]]] = None,
+                    horizon: float = 0.0, progress=None) -> Dict:
+        if self.catalog is None:
+            raise Exception("Warming needs the section cache")
+        
+        self.metrics.reset()
+        warmed = skipped = 0
+        failed = []
+        linked = {}
+        
+        for done, course_code in enumerate(courses, 1):
+            status = self.catalog.status(term, course_code)
+            # anything that would expire before the next pass is fetched now rather than by a student
+            if status and not status['invalidated'] and status['expires_at'] > time.time() + horizon:
+                skipped += 1
+            else:
+                try:
+                    with self.metrics.course(course_code):
+                        self.refreshSections(course_code, term)
+                        linked[course_code] = self.linkCourse(course_code, term)
+                    # linkCourse reports an empty or unlinkable course in its result rather than raising
+                    if linked[course_code]['success']:
+                        warmed += 1
+                    else:
+                        failed.append({'course': course_code, 'error': linked[course_code]['error']})
+                except Exception as e:
+                    failed.append({'course': course_code, 'error': str(e)})
+            
+            if progress:
+                progress({'course': course_code, 'courses_done': done, 'courses_total': len(courses)})
+        
+        with self.metrics.phase('compat'):
+            matrices = self.warmPairs(term, pairs or [], linked)
+        
+        return {
+            'success': True,
+            'term': term,
+            'courses': len(courses),
+            'courses_warmed': warmed,
+            'courses_fresh': skipped,
+            'pairs_precomputed': matrices,
+            'failed': failed,
+            'metrics': self.metrics.toDict()
+        }
+
+    def warmPairs(self, term: str, pairs: List[Tuple[str, str]], linked: Dict[str, Dict]) -> int:
+        # the matrices an unconstrained search over the pair would build, written to the catalog when large enough
+        matrices = 0
+        usable = {}
+        
+        for pair in pairs:
+            for course_code in pair:
+                if course_code not in usable:
+                    course_options = linked.get(course_code) or self.linkCourse(course_code, term)
+                    classes = self.groupEquivalent(course_options['combinations']) if course_options['success'] else []
+                    usable[course_code] = [group for group in classes if not group['conflict']]
+            
+            first, second = (usable[code] for code in pair)
+            if not first or not second:
+                continue
+            
+            digests = (classesDigest(first), classesDigest(second))
+            self.compatPair(first, second, digests[0], digests[1])
+            self.compatPair(second, first, digests[1], digests[0])
+            matrices += 2
+        
+        return matrices
+
+    def revalidate(self, course_code: str, term: str):
+        key = (term, course_code)
+        
+        with self.refresh_lock:
+            if key in self.refreshing:
+                return
+            thread = threading.Thread(target=self.backgroundRefresh, args=(course_code, term), daemon=True)
+            self.refreshing[key] = thread
+        
+        thread.start()
+
+    def backgroundRefresh(self, course_code: str, term: str):
+        try:
+            # whichever request is running when this finishes must not be billed for it
+            with self.metrics.detached():
+                self.refreshSections(course_code, term)
+        except Exception as e:
+            # the stale copy keeps being served, so the failure has to show up somewhere
+            reportProgress({'refresh_failed': course_code, 'term': term, 'error': str(e)})
+        finally:
+            with self.refresh_lock:
+                self.refreshing.pop((term, course_code), None)
+
+    def waitForRefreshes(self, timeout: float = 30.0):
+        with self.refresh_lock:
+            threads = list(self.refreshing.values())
+        
+        for thread in threads:
+            thread.join(timeout)
+
+    def courseSections(self, course_code: str, term: str = "202540") -> List[Dict]:
+        course_code = course_code.upper()
+        
+        if self.catalog is None:
+            return self.fetchSections(course_code, term)
+        
+        with self.metrics.phase('cache_lookup'):
+            entry = self.catalog.get(term, course_code)
+        
+        if self.offline:
+            if entry is None:
+                raise Exception(f'{course_code} is not in the local catalog for term {term}')
+            self.metrics.count('cache_hits')
+            return entry['sections']
+        
+        if entry and entry['fresh']:
+            self.metrics.count('cache_hits')
+            return entry['sections']
+        
+        if entry and not entry['invalidated'] and self.stale_while_revalidate:
+            self.metrics.count('cache_stale_hits')
+            self.revalidate(course_code, term)
+            return entry['sections']
+        
+        self.metrics.count('cache_misses')
+        return self.refreshSections(course_code, term)
+
+    def linkCourse(self, course_code: str, term: str = "202540") -> Dict:
+        try:
+            sections = self.courseSections(course_code, term)
+            
+            if not sections:
                 return {
                     'success': False,
                     'error': f'No sections found for {course_code.upper()}',
                     'course_code': course_code.upper()
                 }
             
-            sections = course_data['data']
             lectures = []
             labs = []
             discussions = []
             
-            for section in sections:
-                schedule_type = section.get('scheduleTypeDescription', '').lower()
-                meeting_details = self.extractMeeting(section)
-                section_num = section['sequenceNumber']
-                
-                categorized_type = self.categorizeSection(section_num, schedule_type)
-                
-                sectionI = {
-                    'crn': section['courseReferenceNumber'],
-                    'course_title': section['courseTitle'],
-                    'course_code': f"{section['subject']}{section['courseNumber']}",
-                    'section': section_num,
-                    'schedule_type': section.get('scheduleTypeDescription', 'Unknown'),
-                    'categorized_type': categorized_type,
-                    'enrollment': {
-                        'current': section['enrollment'],
-                        'maximum': section['maximumEnrollment'],
-                        'available': section['seatsAvailable']
-                    },
-                    'instructors': [f.get('displayName', 'TBA') for f in section.get('faculty', [])],
-                    'schedule': meeting_details['schedule'],
-                    'location': meeting_details['location'],
-                    'days_list': meeting_details['days_list'],
-                    'start_time_minutes': meeting_details['start_time_minutes'],
-                    'end_time_minutes': meeting_details['end_time_minutes'],
-                    'raw_start_time': meeting_details['raw_start_time'],
-                    'raw_end_time': meeting_details['raw_end_time']
-                }
+            for sectionI in map(Section.fromDict, sections):
+                categorized_type = sectionI.categorized_type
                 
                 if categorized_type == 'lecture':
                     lectures.append(sectionI)
@@ -323,7 +1841,9 @@ class UCRCourseScraper:
                 elif categorized_type == 'discussion':
                     discussions.append(sectionI)
             
-            validCombo = self.findLink(lectures, labs, discussions)
+            with self.metrics.phase('link'):
+                validCombo = self.findLink(lectures, labs, discussions)
+            self.metrics.count('combinations_generated', len(validCombo))
             
             return {
                 'success': True,
@@ -341,7 +1861,7 @@ class UCRCourseScraper:
                 'course_code': course_code.upper()
             }
 
-    def findLink(self, lectures: List[Dict], labs: List[Dict], discussions: List[Dict]) -> List[Dict]:
+    def findLink(self, lectures: List[Section], labs: List[Section], discussions: List[Section]) -> List[Combo]:
         validCombo = []
         
         if not lectures:
@@ -354,11 +1874,7 @@ class UCRCourseScraper:
             
             for lab in labO:
                 for disc in discO:
-                    validCombo.append({
-                        'lecture': lecture,
-                        'lab': lab,
-                        'discussion': disc
-                    })
+                    validCombo.append(self.makeCombo(lecture, lab, disc))
             return validCombo
         
         pLink = self.iLinked(lectures, labs, discussions)
@@ -367,15 +1883,15 @@ class UCRCourseScraper:
         
         return self.cLinking(lectures, labs, discussions)
     
-    def iLinked(self, lectures: List[Dict], labs: List[Dict], discussions: List[Dict]) -> List[Dict]:
+    def iLinked(self, lectures: List[Section], labs: List[Section], discussions: List[Section]) -> Optional[List[Combo]]:
         combinations = []
         
-        lectures_sorted = sorted(lectures, key=lambda x: int(x['section']))
-        labs_sorted = sorted(labs, key=lambda x: int(x['section']))
-        discussions_sorted = sorted(discussions, key=lambda x: int(x['section']))
+        lectures_sorted = sorted(lectures, key=lambda x: int(x.section))
+        labs_sorted = sorted(labs, key=lambda x: int(x.section))
+        discussions_sorted = sorted(discussions, key=lambda x: int(x.section))
         
         for lecture in lectures_sorted:
-            lecNum = int(lecture['section'])
+            lecNum = int(lecture.section)
             
             linked_labs = []
             linked_discussions = []
@@ -396,12 +1912,12 @@ class UCRCourseScraper:
                     linked_discussions = discussions_sorted[half_discs:] if discussions_sorted else []
             else:
                 for lab in labs_sorted:
-                    lab_num = int(lab['section'])
+                    lab_num = int(lab.section)
                     if self.sectionslinked(lecNum, lab_num):
                         linked_labs.append(lab)
                 
                 for disc in discussions_sorted:
-                    disc_num = int(disc['section'])
+                    disc_num = int(disc.section)
                     if self.sectionslinked(lecNum, disc_num):
                         linked_discussions.append(disc)
             
@@ -410,15 +1926,11 @@ class UCRCourseScraper:
             
             for lab in labO:
                 for disc in discO:
-                    combinations.append({
-                        'lecture': lecture,
-                        'lab': lab,
-                        'discussion': disc
-                    })
+                    combinations.append(self.makeCombo(lecture, lab, disc))
         
         return combinations if combinations else None
     
-    def cLinking(self, lectures: List[Dict], labs: List[Dict], discussions: List[Dict]) -> List[Dict]:
+    def cLinking(self, lectures: List[Section], labs: List[Section], discussions: List[Section]) -> List[Combo]:
         combinations = []
         
         linkLabLecture = max(1, len(labs) // len(lectures)) if labs else 0
@@ -438,11 +1950,7 @@ class UCRCourseScraper:
             
             for lab in labO:
                 for disc in discO:
-                    combinations.append({
-                        'lecture': lecture,
-                        'lab': lab,
-                        'discussion': disc
-                    })
+                    combinations.append(self.makeCombo(lecture, lab, disc))
         
         return combinations
     
@@ -464,30 +1972,385 @@ class UCRCourseScraper:
         if lecNum // 10 == other_num // 10:
             return True
             
-        return False
+        return False
+
+    def sectionMask(self, section: Union[Section, Dict]) -> int:
+        if isinstance(section, Section):
+            return section.week_mask
+        
+        return weekMask(section['days_list'], section['start_time_minutes'], section['end_time_minutes'])
+
+    def makeCombo(self, lecture: Section, lab: Optional[Section], discussion: Optional[Section]) -> Combo:
+        return Combo(lecture, lab, discussion)
+
+    def timesConflict(self, section1: Union[Section, Dict], section2: Union[Section, Dict]) -> bool:
+        return bool(self.sectionMask(section1) & self.sectionMask(section2))
+
+    def usableOptions(self, courseCombo: List[List[Dict]], stats: Dict) -> List[List[Dict]]:
+        options = []
+        
+        for combos in courseCombo:
+            usable = []
+            for combo in combos:
+                if combo['conflict']:
+                    stats['branches_pruned'] += 1
+                    continue
+                usable.append(combo)
+            options.append(usable)
+        
+        return options
+
+    def searchOrder(self, options: List[List]) -> List[int]:
+        # most-constrained course first so dead branches are cut near the root
+        return sorted(range(len(options)), key=lambda i: len(options[i]))
+
+    def compatibility(self, options: List[List[Dict]], order: List[int]) -> Dict[Tuple[int, int], List[int]]:
+        # only pairs where the second course is searched later are needed for forward checking
+        digests = [classesDigest(classes) for classes in options]
+        return {
+            (course, other): self.compatPair(options[course], options[other], digests[course], digests[other])
+            for depth, course in enumerate(order)
+            for other in order[depth + 1:]
+        }
+
+    def compatPair(self, rows: List[Dict], columns: List[Dict], rows_digest: str, columns_digest: str) -> List[int]:
+        key = (rows_digest, columns_digest)
+        
+        with self.compat_lock:
+            compat = self.compat_cache.get(key)
+            if compat is not None:
+                self.compat_cache.move_to_end(key)
+                self.metrics.count('compat_hits')
+                return compat
+        
+        # small matrices are cheaper to rebuild than to read back from sqlite
+        stored = self.catalog is not None and len(rows) * len(columns) >= COMPAT_CATALOG_CELLS
+        compat = self.catalog.getCompat(rows_digest, columns_digest) if stored else None
+        
+        if compat is None:
+            with self.metrics.phase('compat'):
+                compat = compatRows(rows, columns)
+            self.metrics.count('compat_built')
+            if stored:
+                self.catalog.putCompat(rows_digest, columns_digest, self.classesCourse(rows),
+                                       self.classesCourse(columns), compat)
+        else:
+            self.metrics.count('compat_loaded')
+        
+        with self.compat_lock:
+            self.compat_cache[key] = compat
+            while len(self.compat_cache) > COMPAT_MEMORY_PAIRS:
+                self.compat_cache.popitem(last=False)
+        
+        return compat
+
+    def classesCourse(self, classes: List[Dict]) -> str:
+        return classes[0]['members'][0].lecture.course_code if classes else ''
+
+    def searchSchedules(self, courseCombo: List[List[Dict]], stats: Dict, order: Optional[List[int]] = None,
+                        compat: Optional[Dict[Tuple[int, int], List[int]]] = None,
+                        domains: Optional[List[int]] = None,
+                        resume: Optional[List[int]] = None) -> Iterator[Tuple[Dict, ...]]:
+        options = self.usableOptions(courseCombo, stats)
+        order = self.searchOrder(options) if order is None else order
+        compat = self.compatibility(options, order) if compat is None else compat
+        domains = [(1 << len(classes)) - 1 for classes in options] if domains is None else domains
+        chosen = [None] * len(options)
+        later = [order[depth + 1:] for depth in range(len(order))]
+        
+        # forward checking: every later course keeps a bitset of classes that still fit,
+        # and a choice that empties one of them is cut before descending
+        # resume holds a class index per depth; only the branch leading to it starts mid-domain
+        def extend(depth, domains, resuming):
+            if depth == len(order):
+                yield tuple(chosen)
+                return
+            
+            course = order[depth]
+            remaining = domains[course]
+            if resuming:
+                remaining &= -(1 << resume[depth])
+            while remaining:
+                low = remaining & -remaining
+                remaining ^= low
+                index = low.bit_length() - 1
+                stats['nodes_visited'] += 1
+                
+                narrowed = list(domains)
+                for other in later[depth]:
+                    narrowed[other] &= compat[course, other][index]
+                    if not narrowed[other]:
+                        stats['branches_pruned'] += 1
+                        break
+                else:
+                    chosen[course] = options[course][index]
+                    yield from extend(depth + 1, narrowed, resuming and index == resume[depth])
+            
+            chosen[course] = None
+        
+        yield from extend(0, domains, resume is not None)
+
+    def comboProfile(self, combo: Combo, prefs: 'SchedulePrefs') -> Dict:
+        sections = [section for _, section in combo.sections()]
+        meetings = []
+        
+        for section in sections:
+            start, end = section.start, section.end
+            if start == -1 or end == -1:
+                continue
+            for day in section.days:
+                meetings.append((DAY_INDEX[day], start, end))
+        
+        full = sum(1 for section in sections if section.enrollment.available <= 0)
+        unpreferred = 0
+        if prefs.preferred_instructors:
+            names = [name.lower() for name in combo.lecture.instructors]
+            if not any(preferred in name for preferred in prefs.preferred_instructors for name in names):
+                unpreferred = 1
+        
+        return {
+            'meetings': meetings,
+            'busy': sum(end - start for _, start, end in meetings),
+            'full_sections': full,
+            'unpreferred': unpreferred,
+            'separable': prefs.weights['seats'] * full + prefs.weights['instructors'] * unpreferred
+        }
+
+    def scheduleCost(self, days: List[Optional[Tuple[int, int, int]]], separable: float, prefs: 'SchedulePrefs',
+                     gap_relief: int = 0) -> Tuple[float, Dict]:
+        early = late = gaps = campus = 0
+        
+        for day in days:
+            if day is None:
+                continue
+            first, last, busy = day
+            campus += 1
+            early += max(0, prefs.start_after - first)
+            late += max(0, last - prefs.end_before)
+            gaps += last - first - busy
+        
+        breakdown = {
+            'early_start': early,
+            'late_end': late,
+            'campus_days': campus,
+            'gaps': max(0, gaps - gap_relief)
+        }
+        cost = separable + sum(prefs.weights[name] * value for name, value in breakdown.items())
+        
+        return cost, breakdown
+
+    def meetingSignature(self, combo: Combo) -> Tuple[Tuple[int, int, int], ...]:
+        meetings = []
+        
+        for _, section in combo.sections():
+            if section.start == -1 or section.end == -1:
+                continue
+            for day in section.days:
+                meetings.append((DAY_INDEX[day], section.start, section.end))
+        
+        return tuple(sorted(meetings))
+
+    def groupEquivalent(self, combos: List[Combo]) -> List[Dict]:
+        classes = {}
+        
+        for combo in combos:
+            signature = self.meetingSignature(combo)
+            group = classes.get(signature)
+            if group is None:
+                classes[signature] = {
+                    'mask': combo.mask,
+                    'conflict': combo.conflict,
+                    'members': [combo]
+                }
+            else:
+                group['members'].append(combo)
+        
+        return list(classes.values())
+
+    def rankSchedules(self, courseClasses: List[List[Dict]], stats: Dict, prefs: 'SchedulePrefs',
+                      order: Optional[List[int]] = None) -> List[Tuple[float, Tuple[Dict, ...], Dict]]:
+        options = []
+        
+        for usable in self.usableOptions(courseClasses, stats):
+            profiled = []
+            for group in usable:
+                members = [(member, self.comboProfile(member, prefs)) for member in group['members']]
+                members.sort(key=lambda item: item[1]['separable'])
+                # every member meets at the same times, so only seats and instructors tell them apart
+                profile = dict(members[0][1], members=members)
+                profiled.append((group, profile))
+            # cheapest options first so good schedules fill the heap early and tighten the bound
+            profiled.sort(key=lambda item: item[1]['separable'])
+            options.append(profiled)
+        
+        order = self.searchOrder(options) if order is None else order
+        
+        # optimistic completions for the courses still to be placed below each depth
+        separable_floor = [0.0] * (len(order) + 1)
+        gap_relief = [0] * (len(order) + 1)
+        for depth in range(len(order) - 1, -1, -1):
+            profiled = options[order[depth]]
+            separable_floor[depth] = separable_floor[depth + 1] + min((profile['separable'] for _, profile in profiled), default=0)
+            gap_relief[depth] = gap_relief[depth + 1] + max((profile['busy'] for _, profile in profiled), default=0)
+        
+        profiles = [None] * len(options)
+        picked = [None] * len(options)
+        heap = []
+        seq = itertools.count()
+        
+        def worst():
+            return -heap[0][0] if len(heap) == prefs.top_k else math.inf
+        
+        def expand(course, cost, breakdown, floors):
+            if course == len(profiles):
+                stats['schedules_scored'] += 1
+                entry = (-cost, -next(seq), tuple(member for member, _ in picked), dict(
+                    breakdown,
+                    full_sections=sum(profile['full_sections'] for _, profile in picked),
+                    unpreferred_instructors=sum(profile['unpreferred'] for _, profile in picked)
+                ))
+                if len(heap) < prefs.top_k:
+                    heapq.heappush(heap, entry)
+                else:
+                    heapq.heapreplace(heap, entry)
+                return
+            
+            for member, profile in profiles[course]['members']:
+                if cost + profile['separable'] + floors[course + 1] >= worst():
+                    break
+                picked[course] = (member, profile)
+                expand(course + 1, cost + profile['separable'], breakdown, floors)
+            
+            picked[course] = None
+        
+        def extend(depth, occupied, days, separable):
+            if depth == len(order):
+                base, breakdown = self.scheduleCost(days, 0.0, prefs)
+                floors = [0.0] * (len(profiles) + 1)
+                for course in range(len(profiles) - 1, -1, -1):
+                    floors[course] = floors[course + 1] + profiles[course]['separable']
+                expand(0, base, breakdown, floors)
+                return
+            
+            if len(heap) == prefs.top_k:
+                bound, _ = self.scheduleCost(days, separable + separable_floor[depth], prefs, gap_relief[depth])
+                if bound >= worst():
+                    stats['bound_pruned'] += 1
+                    return
+            
+            course = order[depth]
+            for group, profile in options[course]:
+                stats['nodes_visited'] += 1
+                
+                if group['mask'] & occupied:
+                    stats['branches_pruned'] += 1
+                    continue
+                
+                placed = list(days)
+                for day, start, end in profile['meetings']:
+                    if placed[day] is None:
+                        placed[day] = (start, end, end - start)
+                    else:
+                        first, last, busy = placed[day]
+                        placed[day] = (min(first, start), max(last, end), busy + end - start)
+                
+                profiles[course] = profile
+                extend(depth + 1, occupied | group['mask'], placed, separable + profile['separable'])
+            
+            profiles[course] = None
+        
+        extend(0, 0, [None] * 7, 0.0)
+        
+        ranked = sorted(heap, key=lambda entry: (-entry[0], -entry[1]))
+        return [(-cost, combination, breakdown) for cost, _, combination, breakdown in ranked]
+
+    def worthParallel(self, usable: List[List[Dict]]) -> bool:
+        # forking and pickling the classes costs more than small searches take on one core
+        return self.processes > 1 and len(usable) > 1 and math.prod(len(classes) for classes in usable) >= PARALLEL_MIN_WORK
+
+    def partitionPlan(self, usable: List[List[Dict]], order: List[int]) -> List[Tuple[Tuple[int, int], ...]]:
+        first = order[0]
+        plan = [((first, i),) for i in range(len(usable[first]))]
+        
+        if len(plan) < 2 * self.processes:
+            second = order[1]
+            plan = [((first, i), (second, j))
+                    for i, a in enumerate(usable[first])
+                    for j, b in enumerate(usable[second])
+                    if not (a['mask'] & b['mask'])]
+        
+        return plan
+
+    def processPool(self) -> 'ProcessPoolExecutor':
+        if self.process_pool is None:
+            # multiprocessing is a noticeable share of import time and most runs stay on one core
+            from concurrent.futures import ProcessPoolExecutor
+            self.process_pool = ProcessPoolExecutor(max_workers=self.processes)
+        return self.process_pool
+
+    def runPartitions(self, usable: List[List[Dict]], order: List[int], stats: Dict, limit: Optional[int],
+                      prefs: Optional[Dict]) -> Iterator[List]:
+        plan = self.partitionPlan(usable, order)
+        stats['partitions'] = len(plan)
+        compat = self.compatibility(usable, order) if prefs is None else None
+        futures = [self.processPool().submit(searchPartition, usable, order, fixed, limit, prefs, compat) for fixed in plan]
+        found = 0
+        
+        # results are consumed in plan order, which is the order a single-process search would produce
+        for i, future in enumerate(futures):
+            results, partStats = future.result()
+            for name, value in partStats.items():
+                stats[name] = stats.get(name, 0) + value
+            yield results
+            
+            found += len(results)
+            if prefs is None and limit is not None and found >= limit:
+                for pending in futures[i + 1:]:
+                    pending.cancel()
+                return
 
-    def timesConflict(self, section1: Dict, section2: Dict) -> bool:
-        if (section1['start_time_minutes'] == -1 or section1['end_time_minutes'] == -1 or
-            section2['start_time_minutes'] == -1 or section2['end_time_minutes'] == -1):
-            return False
+    def classSchedules(self, courseClasses: List[List[Dict]], stats: Dict, limit: Optional[int] = None) -> Iterator[Tuple[Dict, ...]]:
+        usable = self.usableOptions(courseClasses, stats)
+        order = self.searchOrder(usable)
         
-        days1 = set(section1['days_list'])
-        days2 = set(section2['days_list'])
+        if not self.worthParallel(usable):
+            yield from self.searchSchedules(usable, stats, order)
+            return
         
-        if not days1.intersection(days2):
-            return False
+        for results in self.runPartitions(usable, order, stats, limit, None):
+            for indices in results:
+                yield tuple(usable[course][index] for course, index in enumerate(indices))
+
+    def rankedSchedules(self, courseClasses: List[List[Dict]], stats: Dict, prefs: Dict) -> List[Tuple[float, Tuple[Dict, ...], Dict]]:
+        usable = self.usableOptions(courseClasses, stats)
+        schedulePrefs = SchedulePrefs(prefs)
+        
+        if not self.worthParallel(usable):
+            return self.rankSchedules(usable, stats, schedulePrefs)
         
-        start1, end1 = section1['start_time_minutes'], section1['end_time_minutes']
-        start2, end2 = section2['start_time_minutes'], section2['end_time_minutes']
+        merged = []
+        for part, results in enumerate(self.runPartitions(usable, self.searchOrder(usable), stats, None, prefs)):
+            for rank, (cost, indices, breakdown) in enumerate(results):
+                merged.append((cost, part, rank, indices, breakdown))
         
-        return start1 < end2 and start2 < end1
+        merged.sort(key=lambda entry: entry[:3])
+        return [
+            (cost, tuple(usable[course][group]['members'][member] for course, (group, member) in enumerate(indices)), breakdown)
+            for cost, _, _, indices, breakdown in merged[:schedulePrefs.top_k]
+        ]
 
-    def scheduleGenerate(self, course_list: List[str], term: str = "202540") -> Dict:
+    def collectCourses(self, course_list: List[str], term: str = "202540") -> Tuple[List[Dict], List[Dict]]:
         all_course_options = []
         failedExtraction = []
         
-        for course_code in course_list:
-            course_options = self.linkCourse(course_code, term)
+        def measuredLink(course_code):
+            with self.metrics.course(course_code.upper()):
+                return self.linkCourse(course_code, term)
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, max(1, len(course_list)))) as executor:
+            fetched = list(executor.map(measuredLink, course_list))
+        
+        for course_code, course_options in zip(course_list, fetched):
             if course_options['success']:
                 all_course_options.append(course_options)
             else:
@@ -496,100 +2359,1020 @@ class UCRCourseScraper:
                     'error': course_options['error']
                 })
         
-        if failedExtraction:
+        return all_course_options, failedExtraction
+
+    def formatSchedule(self, schedule_id: int, combination: Tuple[Dict, ...],
+                       table: Optional[SectionTable] = None) -> Dict:
+        if table is not None:
             return {
+                'schedule_id': schedule_id,
+                'sections': table.indices(combination)
+            }
+        
+        return {
+            'schedule_id': schedule_id,
+            'courses': [courseCombo.view() for courseCombo in combination]
+        }
+
+    def prepareCourses(self, course_list: List[str], term: str, summary: Dict,
+                       constraints: Optional[Dict] = None) -> Optional[List[List[Dict]]]:
+        rules = ScheduleConstraints(constraints) if constraints else None
+        all_course_options, failedExtraction = self.collectCourses(course_list, term)
+        
+        if failedExtraction:
+            summary.update({
                 'success': False,
                 'failedExtraction': failedExtraction,
                 'error': 'Issue trying to get everything'
-            }
+            })
+            return None
         
         courseCombo = []
+        constraintFiltered = {}
         
         for course_options in all_course_options:
-            courseCombo.append(course_options['combinations'])
+            combos = course_options['combinations']
+            if rules:
+                combos = rules.filterCombos(course_options)
+                constraintFiltered[course_options['course_code']] = len(course_options['combinations']) - len(combos)
+            courseCombo.append(combos)
+        
+        if rules:
+            known = {section.crn for course_options in all_course_options
+                     for section in course_options['lectures'] + course_options['labs'] + course_options['discussions']}
+            missing = sorted(rules.pinned_crns - known)
+            if missing:
+                summary.update({
+                    'success': False,
+                    'error': f"Pinned CRNs not found in the requested courses: {', '.join(missing)}"
+                })
+                return None
+            summary['constraint_filtered'] = constraintFiltered
         
-        fullAmount = list(product(*courseCombo))
-        fullCombination = len(fullAmount)
+        return courseCombo
+
+    def iterSchedules(self, course_list: List[str], term: str = "202540", limit: Optional[int] = None,
+                      summary: Optional[Dict] = None, prefs: Optional[Dict] = None,
+                      constraints: Optional[Dict] = None, grouped: bool = False,
+                      table: Optional[SectionTable] = None) -> Iterator[Dict]:
+        summary = {} if summary is None else summary
+        courseCombo = self.prepareCourses(course_list, term, summary, constraints)
+        if courseCombo is None:
+            return
         
-        validCombo = []
+        courseClasses = [self.groupEquivalent(combos) for combos in courseCombo]
+        yield from self.iterClasses(course_list, term, courseCombo, courseClasses, limit, summary, prefs, grouped, table)
+
+    def iterClasses(self, course_list: List[str], term: str, courseCombo: List[List[Combo]],
+                    courseClasses: List[List[Dict]], limit: Optional[int], summary: Dict,
+                    prefs: Optional[Dict] = None, grouped: bool = False, table: Optional[SectionTable] = None,
+                    found: Optional[Iterable[Tuple[Dict, ...]]] = None, stats: Optional[Dict] = None) -> Iterator[Dict]:
+        fullCombination = math.prod(len(combos) for combos in courseCombo)
+        
+        searchStats = {
+            'nodes_visited': 0,
+            'branches_pruned': 0,
+            **(stats or {}),
+            'equivalence_classes': sum(len(classes) for classes in courseClasses)
+        }
+        
+        summary.update({
+            'success': True,
+            'courses_analyzed': course_list,
+            'term': term,
+            'total_possible_combinations': fullCombination,
+            'valid-Combo_count': 0,
+            'conflicting_combinations_count': None,
+            'search_stats': searchStats,
+            'limit_reached': limit is not None and limit <= 0
+        })
         
-        for combination in fullAmount:
-            all_sections = []
+        if summary['limit_reached']:
+            return
+        
+        if prefs:
+            yield from self.iterRanked(courseClasses, prefs, limit, summary, table)
+            return
+        
+        if found is None:
+            found = self.classSchedules(courseClasses, searchStats, limit)
+        found = self.metrics.timed('search', found)
+        
+        if grouped:
+            yield from self.iterGrouped(found, fullCombination, limit, summary, table)
+            return
+        
+        for classes in found:
+            for combination in itertools.product(*(group['members'] for group in classes)):
+                summary['valid-Combo_count'] += 1
+                yield self.formatSchedule(summary['valid-Combo_count'], combination, table)
+                
+                if limit is not None and summary['valid-Combo_count'] >= limit:
+                    summary['limit_reached'] = True
+                    return
+        
+        summary['conflicting_combinations_count'] = fullCombination - summary['valid-Combo_count']
+
+    def iterGrouped(self, found: Iterable[Tuple[Dict, ...]], fullCombination: int, limit: Optional[int],
+                    summary: Dict, table: Optional[SectionTable] = None) -> Iterator[Dict]:
+        summary['equivalent_groups'] = 0
+        
+        for classes in found:
+            summary['equivalent_groups'] += 1
+            schedule = self.groupedSchedule(summary['equivalent_groups'], classes, table)
+            summary['valid-Combo_count'] += schedule['expansions']
+            yield schedule
+            
+            if limit is not None and summary['equivalent_groups'] >= limit:
+                summary['limit_reached'] = True
+                return
+        
+        summary['conflicting_combinations_count'] = fullCombination - summary['valid-Combo_count']
+
+    def groupedSchedule(self, schedule_id: int, classes: Tuple[Dict, ...], table: Optional[SectionTable] = None) -> Dict:
+        schedule = self.formatSchedule(schedule_id, tuple(group['members'][0] for group in classes), table)
+        schedule['expansions'] = math.prod(len(group['members']) for group in classes)
+        schedule['alternatives'] = [[self.comboCrns(member) for member in group['members']] for group in classes]
+        return schedule
+
+    def expandFrom(self, classes: Tuple[Dict, ...], start: int = 0) -> Iterator[Tuple[Combo, ...]]:
+        # itertools.product order, but entered at any offset without walking the combinations before it
+        sizes = [len(group['members']) for group in classes]
+        for index in range(start, math.prod(sizes)):
+            combination = []
+            for group, size in zip(reversed(classes), reversed(sizes)):
+                index, digit = divmod(index, size)
+                combination.append(group['members'][digit])
+            yield tuple(reversed(combination))
+
+    def iterPage(self, course_list: List[str], term: str, page_size: int, cursor: Optional[str], summary: Dict,
+                 prefs: Optional[Dict] = None, constraints: Optional[Dict] = None, grouped: bool = False,
+                 table: Optional[SectionTable] = None, limit: Optional[int] = None) -> Iterator[Dict]:
+        # pages walk one canonical course order, so any permutation of a request shares its cursors and cached pages
+        canonical = sorted(range(len(course_list)), key=lambda i: course_list[i].upper())
+        restore = [canonical.index(i) for i in range(len(course_list))]
+        courseCombo = self.prepareCourses([course_list[i] for i in canonical], term, summary, constraints)
+        if courseCombo is None:
+            return
+        
+        def requested(item):
+            return tuple(item[i] for i in restore)
+        
+        courseClasses = [self.groupEquivalent(combos) for combos in courseCombo]
+        searchStats = {
+            'nodes_visited': 0,
+            'branches_pruned': 0,
+            'equivalence_classes': sum(len(classes) for classes in courseClasses)
+        }
+        usable = self.usableOptions(courseClasses, searchStats)
+        digest = self.searchDigest(course_list, term, usable, prefs, constraints, grouped)
+        
+        position = {'path': None, 'offset': 0, 'emitted': 0}
+        if cursor:
+            position = decodeCursor(cursor)
+            if position is None or position.get('digest') != digest:
+                summary.update({
+                    'success': False,
+                    'error': 'Cursor does not match this request or the course data changed; start again without a cursor'
+                })
+                return
+        
+        emitted = position['emitted']
+        if limit is not None:
+            page_size = min(page_size, max(0, limit - emitted))
+        
+        summary.update({
+            'success': True,
+            'courses_analyzed': course_list,
+            'term': term,
+            'total_possible_combinations': math.prod(len(combos) for combos in courseCombo),
+            'valid-Combo_count': 0,
+            'conflicting_combinations_count': None,
+            'search_stats': searchStats,
+            'page_start': emitted,
+            'page_size': page_size,
+            'next_cursor': None
+        })
+        
+        def nextCursor(path, offset, count):
+            if limit is not None and count >= limit:
+                summary['limit_reached'] = True
+                return
+            summary['next_cursor'] = encodeCursor({'digest': digest, 'path': path, 'offset': offset, 'emitted': count})
+        
+        if prefs:
+            # ranking is bounded by top_k, so a page is a slice of the same ranked list
+            summary.update({'ranked': True, 'top_k': SchedulePrefs(prefs).top_k})
+            searchStats.update({'schedules_scored': 0, 'bound_pruned': 0})
+            with self.metrics.phase('search'):
+                ranked = self.rankedSchedules(usable, searchStats, prefs)
             
-            for courseCombo in combination:
-                all_sections.append(courseCombo['lecture'])
-                if courseCombo['lab']:
-                    all_sections.append(courseCombo['lab'])
-                if courseCombo['discussion']:
-                    all_sections.append(courseCombo['discussion'])
+            for rank, (cost, combination, breakdown) in enumerate(ranked[emitted:emitted + page_size], emitted + 1):
+                schedule = self.formatSchedule(rank, requested(combination), table)
+                schedule['score'] = round(cost, 2)
+                schedule['score_breakdown'] = breakdown
+                summary['valid-Combo_count'] += 1
+                yield schedule
             
-            issue = False
+            if page_size and emitted + page_size < len(ranked):
+                nextCursor(None, 0, emitted + page_size)
+            return
+        
+        order = self.searchOrder(usable)
+        positions = [{id(group): i for i, group in enumerate(classes)} for classes in usable]
+        found = self.searchSchedules(usable, searchStats, order, resume=position['path'])
+        
+        for classes in self.metrics.timed('search', found):
+            path = [positions[course][id(classes[course])] for course in order]
+            offset = position['offset'] if path == position['path'] else 0
+            items = iter([classes] if offset == 0 else []) if grouped else self.expandFrom(classes, offset)
             
-            for i in range(len(all_sections)):
-                for j in range(i + 1, len(all_sections)):
-                    if self.timesConflict(all_sections[i], all_sections[j]):
-                        issue = True
-                        break
-                if issue:
-                    break
+            for item in items:
+                if summary['valid-Combo_count'] >= page_size:
+                    # the next schedule exists, so the page ends here and the cursor points at it
+                    if page_size:
+                        nextCursor(path, offset, emitted + page_size)
+                    return
+                
+                summary['valid-Combo_count'] += 1
+                schedule_id = emitted + summary['valid-Combo_count']
+                item = requested(item)
+                yield self.groupedSchedule(schedule_id, item, table) if grouped else self.formatSchedule(schedule_id, item, table)
+                offset += 1
+
+    def searchDigest(self, course_list: List[str], term: str, usable: List[List[Dict]], prefs: Optional[Dict],
+                     constraints: Optional[Dict], grouped: bool) -> str:
+        # covers everything the enumeration order depends on, so a cursor can only resume the search that made it
+        structure = [[[format(group['mask'], 'x'), [[section.crn for _, section in member.sections()] for member in group['members']]]
+                      for group in classes] for classes in usable]
+        seats = [[section.enrollment.available > 0 for classes in usable for group in classes
+                  for member in group['members'] for _, section in member.sections()]] if prefs else None
+        request = {'term': term, 'courses': sorted(code.upper() for code in course_list), 'prefs': prefs,
+                   'constraints': constraints, 'grouped': grouped, 'structure': structure, 'seats': seats}
+        return hashlib.sha1(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def comboCrns(self, combo: Combo) -> Dict:
+        return {part: section.crn for part, section in combo.sections()}
+
+    def iterRanked(self, courseClasses: List[List[Dict]], prefs: Dict, limit: Optional[int],
+                   summary: Dict, table: Optional[SectionTable] = None) -> Iterator[Dict]:
+        searchStats = summary['search_stats']
+        searchStats.update({'schedules_scored': 0, 'bound_pruned': 0})
+        summary.update({'ranked': True, 'top_k': SchedulePrefs(prefs).top_k})
+        
+        with self.metrics.phase('search'):
+            ranked = self.rankedSchedules(courseClasses, searchStats, prefs)
+        
+        for rank, (cost, combination, breakdown) in enumerate(ranked, 1):
+            if limit is not None and rank > limit:
+                summary['limit_reached'] = True
+                return
             
-            if not issue:
-                validCombo.append(combination)
+            schedule = self.formatSchedule(rank, combination, table)
+            schedule['score'] = round(cost, 2)
+            schedule['score_breakdown'] = breakdown
+            summary['valid-Combo_count'] = rank
+            yield schedule
+
+    def countClasses(self, courseClasses: List[List[Dict]], stats: Dict) -> Tuple[int, List[List[int]], List[List[Dict]]]:
+        options = self.usableOptions(courseClasses, stats)
+        order = self.searchOrder(options)
+        
+        # only slots a later course could still collide with matter, so prefixes that differ
+        # elsewhere collapse into one memo entry
+        remaining = [0] * (len(order) + 1)
+        for depth in range(len(order) - 1, -1, -1):
+            for group in options[order[depth]]:
+                remaining[depth] |= group['mask']
+            remaining[depth] |= remaining[depth + 1]
+        
+        suffix = {}
+        def completions(depth, occupied):
+            if depth == len(order):
+                return 1
+            key = (depth, occupied)
+            if key not in suffix:
+                total = 0
+                for group in options[order[depth]]:
+                    if group['mask'] & occupied:
+                        continue
+                    total += len(group['members']) * completions(depth + 1, (occupied | group['mask']) & remaining[depth + 1])
+                suffix[key] = total
+            return suffix[key]
         
-        results = {
+        # forward pass over distinct prefixes gives, per class, how many full schedules pass through it
+        perClass = [[0] * len(classes) for classes in options]
+        prefixes = {0: 1}
+        
+        for depth, course in enumerate(order):
+            following = {}
+            for occupied, ways in prefixes.items():
+                for index, group in enumerate(options[course]):
+                    if group['mask'] & occupied:
+                        continue
+                    reached = (occupied | group['mask']) & remaining[depth + 1]
+                    perClass[course][index] += ways * completions(depth + 1, reached)
+                    following[reached] = following.get(reached, 0) + ways * len(group['members'])
+            prefixes = following
+            stats['prefix_states'] = stats.get('prefix_states', 0) + len(prefixes)
+        
+        stats['memo_entries'] = len(suffix)
+        total = sum(prefixes.values()) if order else 0
+        return total, perClass, options
+
+    def countSchedules(self, course_list: List[str], term: str = "202540", constraints: Optional[Dict] = None) -> Dict:
+        # one reset per request, so a result cache miss still reports its lookup
+        self.metrics.reset()
+        self.recordDemand(term, course_list)
+        spec = {'constraints': constraints}
+        cached = self.cachedResult('count', course_list, term, spec)
+        if cached is not None:
+            return cached
+        
+        summary = {}
+        courseCombo = self.prepareCourses(course_list, term, summary, constraints)
+        if courseCombo is None:
+            return {**summary, 'metrics': self.resultMetrics()}
+        
+        fullCombination = math.prod(len(combos) for combos in courseCombo)
+        courseClasses = [self.groupEquivalent(combos) for combos in courseCombo]
+        countStats = {'branches_pruned': 0, 'equivalence_classes': sum(len(classes) for classes in courseClasses)}
+        with self.metrics.phase('count'):
+            total, perClass, options = self.countClasses(courseClasses, countStats)
+        
+        breakdown = []
+        for course, combos, classes, counts in zip(course_list, courseCombo, options, perClass):
+            byLecture = {}
+            for group, count in zip(classes, counts):
+                for member in group['members']:
+                    crn = member.lecture.crn
+                    byLecture[crn] = byLecture.get(crn, 0) + count
+            breakdown.append({
+                'course_code': course,
+                'combinations': len(combos),
+                'usable_combinations': sum(len(group['members']) for group in classes),
+                'feasible_combinations': sum(len(group['members']) for group, count in zip(classes, counts) if count),
+                'schedules_by_lecture': byLecture
+            })
+        
+        result = {
+            **summary,
             'success': True,
             'courses_analyzed': course_list,
             'term': term,
             'total_possible_combinations': fullCombination,
-            'valid-Combo_count': len(validCombo),
-            'conflicting_combinations_count': fullCombination - len(validCombo),
-            'valid_schedules': []
+            'valid-Combo_count': total,
+            'conflicting_combinations_count': fullCombination - total,
+            'course_breakdown': breakdown,
+            'count_stats': countStats,
+            'metrics': self.resultMetrics(countStats)
         }
+        self.storeResult('count', course_list, term, spec, result)
+        return result
+
+    def resultMetrics(self, searchStats: Optional[Dict] = None) -> Dict:
+        # each visited search node is one class checked against the occupied prefix
+        if searchStats:
+            self.metrics.count('pairs_checked', searchStats.get('nodes_visited', 0))
+            self.metrics.count('branches_pruned', searchStats.get('branches_pruned', 0))
+        return self.metrics.toDict()
+
+    def scheduleGenerate(self, course_list: List[str], term: str = "202540", limit: Optional[int] = None,
+                         prefs: Optional[Dict] = None, constraints: Optional[Dict] = None,
+                         grouped: bool = False, compact: bool = False, page_size: Optional[int] = None,
+                         cursor: Optional[str] = None) -> Dict:
+        self.metrics.reset()
+        self.recordDemand(term, course_list)
+        spec = {'limit': limit, 'prefs': prefs, 'constraints': constraints, 'grouped': grouped, 'compact': compact}
+        if page_size is not None or cursor:
+            spec.update({'page_size': page_size, 'cursor': cursor})
+        cached = self.cachedResult('generate', course_list, term, spec)
+        if cached is not None:
+            return cached
+        
+        summary = {}
+        table = SectionTable() if compact else None
+        if page_size is not None or cursor:
+            valid_schedules = list(self.iterPage(course_list, term, PAGE_SIZE if page_size is None else page_size, cursor,
+                                                 summary, prefs, constraints, grouped, table, limit))
+        else:
+            valid_schedules = list(self.iterSchedules(course_list, term, limit, summary, prefs, constraints, grouped, table))
+        result = self.buildResult(summary, valid_schedules, table)
+        
+        if result['success']:
+            self.storeResult('generate', course_list, term, spec, result)
+        return result
+
+    def buildResult(self, summary: Dict, valid_schedules: List[Dict], table: Optional[SectionTable] = None) -> Dict:
+        summary['metrics'] = self.resultMetrics(summary.get('search_stats'))
         
-        for i, combination in enumerate(validCombo, 1):
-            schedule = {
-                'schedule_id': i,
-                'courses': []
+        if not summary['success']:
+            return summary
+        
+        if table is not None:
+            return {
+                **summary,
+                **self.compactSchedules(valid_schedules, table)
+            }
+        
+        return {
+            **summary,
+            'valid_schedules': valid_schedules
+        }
+
+    def planUpdate(self, plan_id: str, term: str = "202540", add: Optional[List[str]] = None,
+                   remove: Optional[List[str]] = None, courses: Optional[List[str]] = None,
+                   constraints: Optional[Dict] = None, limit: Optional[int] = None, prefs: Optional[Dict] = None,
+                   grouped: bool = False, compact: bool = False) -> Dict:
+        self.metrics.reset()
+        plan = self.plans.get(plan_id)
+        if plan is None or plan.term != term or plan.constraints != constraints:
+            plan = PlanSession(term, constraints)
+        self.plans[plan_id] = plan
+        self.plans.move_to_end(plan_id)
+        while len(self.plans) > PLAN_LIMIT:
+            self.plans.popitem(last=False)
+        
+        add = [code.upper() for code in add or []]
+        remove = [code.upper() for code in remove or []]
+        if courses is not None:
+            wanted = [code.upper() for code in courses]
+            remove = [code for code in plan.codes() if code not in wanted]
+            add = wanted
+        
+        for course_code in remove:
+            plan.remove(course_code)
+        if add:
+            self.recordDemand(term, plan.codes() + add)
+        
+        present = set(plan.codes())
+        added = [code for code in dict.fromkeys(add) if code not in present]
+        changed = [course['course_code'] for course in plan.courses if self.planCourseStale(plan, course)]
+        summary = {'plan_id': plan_id}
+        
+        all_course_options, failedExtraction = self.collectCourses(changed + added, term)
+        if failedExtraction:
+            summary.update({
+                'success': False,
+                'failedExtraction': failedExtraction,
+                'error': 'Issue trying to get everything'
+            })
+            return self.buildResult(summary, [])
+        
+        for course_options in all_course_options:
+            course = self.planCourse(plan, course_options)
+            if course['course_code'] in present:
+                # relinked after its sections expired; partials only go if the data actually moved
+                if course['version'] != plan.courses[plan.position(course['course_code'])]['version']:
+                    plan.replace(course)
+                else:
+                    self.patchPlanSeats(term, {section.crn: section.enrollment.toDict() for section in course['sections']})
+            else:
+                plan.courses.append(course)
+        
+        if plan.rules:
+            known = {section.crn for course in plan.courses for section in course['sections']}
+            missing = sorted(plan.rules.pinned_crns - known)
+            if missing:
+                summary.update({
+                    'success': False,
+                    'error': f"Pinned CRNs not found in the requested courses: {', '.join(missing)}"
+                })
+                return self.buildResult(summary, [])
+            summary['constraint_filtered'] = {course['course_code']: course['filtered'] for course in plan.courses}
+        
+        stats = {'nodes_visited': 0, 'branches_pruned': 0, 'levels_reused': len(plan.levels)}
+        with self.metrics.phase('search'):
+            retained = prefs is None and plan.extend(stats)
+        stats['levels_retained'] = len(plan.levels)
+        self.trimPlans(plan_id)
+        
+        table = SectionTable() if compact else None
+        valid_schedules = list(self.iterClasses(plan.codes(), term, [course['combos'] for course in plan.courses],
+                                                [course['classes'] for course in plan.courses], limit, summary,
+                                                prefs, grouped, table, plan.schedules() if retained else None, stats))
+        return self.buildResult(summary, valid_schedules, table)
+
+    def trimPlans(self, keep: str):
+        # the partial bound covers every plan in the worker, so the least recently used give theirs up first
+        total = sum(plan.partials() for plan in self.plans.values())
+        for plan_id, plan in self.plans.items():
+            if total <= PLAN_PARTIAL_LIMIT:
+                break
+            if plan_id != keep:
+                total -= plan.partials()
+                plan.levels.clear()
+
+    def planCourse(self, plan: PlanSession, course_options: Dict) -> Dict:
+        combos = plan.rules.filterCombos(course_options) if plan.rules else course_options['combinations']
+        classes = self.groupEquivalent(combos)
+        status = self.catalog.status(plan.term, course_options['course_code']) if self.catalog is not None else None
+        
+        return {
+            'course_code': course_options['course_code'],
+            'version': status['version'] if status else None,
+            'sections': course_options['lectures'] + course_options['labs'] + course_options['discussions'],
+            'combos': combos,
+            'filtered': len(course_options['combinations']) - len(combos),
+            'classes': classes,
+            'usable': [group for group in classes if not group['conflict']]
+        }
+
+    def planCourseStale(self, plan: PlanSession, course: Dict) -> bool:
+        # without a catalog a plan keeps the sections it was built from
+        if self.catalog is None or self.offline:
+            return False
+        
+        status = self.catalog.status(plan.term, course['course_code'])
+        if status is None or status['version'] != course['version'] or status['invalidated']:
+            return True
+        if status['fresh']:
+            return False
+        if self.stale_while_revalidate:
+            self.revalidate(course['course_code'], plan.term)
+            return False
+        return True
+
+    def planDrop(self, plan_id: str) -> Dict:
+        return {
+            'success': True,
+            'dropped': self.plans.pop(plan_id, None) is not None
+        }
+
+    def cachedVersions(self, course_list: List[str], term: str, seats: bool = False) -> Optional[Dict]:
+        # a course that would be refetched right now gets no cached result, so a
+        # refresh that bumps its version is never answered from the old data
+        versions = {}
+        for course_code in course_list:
+            course_code = course_code.upper()
+            status = self.catalog.status(term, course_code)
+            if status is None:
+                return None
+            if not status['fresh'] and not self.offline:
+                if status['invalidated'] or not self.stale_while_revalidate:
+                    return None
+                self.revalidate(course_code, term)
+            versions[course_code] = self.resultVersion(status, seats)
+        return versions
+
+    def resultVersion(self, status: Dict, seats: bool):
+        # ranking reads seat counts, so ranked results also go stale with a seat refresh
+        return [status['version'], status['seats_version']] if seats else status['version']
+
+    def cachedResult(self, command: str, course_list: List[str], term: str, spec: Dict) -> Optional[Dict]:
+        if self.result_cache is None:
+            return None
+        
+        with self.metrics.phase('result_cache'):
+            versions = self.cachedVersions(course_list, term, bool(spec.get('prefs')))
+            hit = self.result_cache.get(ResultCache.key(command, term, course_list, spec), versions) if versions else None
+        
+        if hit is None:
+            return None
+        
+        result, tier = hit
+        self.metrics.count('result_cache_hits')
+        result = self.reorderResult(result, course_list)
+        result['result_cache'] = tier
+        result['metrics'] = self.metrics.toDict()
+        return result
+
+    def storeResult(self, command: str, course_list: List[str], term: str, spec: Dict, result: Dict):
+        if self.result_cache is None:
+            return
+        
+        self.metrics.count('result_cache_misses')
+        result['metrics'] = self.metrics.toDict()
+        versions = {}
+        for course_code in course_list:
+            status = self.catalog.status(term, course_code.upper())
+            # sections served stale may already be replaced under a newer version
+            if status is None or not (status['fresh'] or self.offline):
+                return
+            versions[course_code.upper()] = self.resultVersion(status, bool(spec.get('prefs')))
+        
+        self.result_cache.put(ResultCache.key(command, term, course_list, spec), versions,
+                              {name: value for name, value in result.items() if name != 'metrics'})
+
+    def reorderResult(self, result: Dict, course_list: List[str]) -> Dict:
+        # the key ignores course order, so a hit may have been computed for a permutation of this request
+        stored = [code.upper() for code in result['courses_analyzed']]
+        requested = [code.upper() for code in course_list]
+        result['courses_analyzed'] = course_list
+        if stored == requested:
+            return result
+        
+        order = [stored.index(code) for code in requested]
+        position = {code: i for i, code in enumerate(requested)}
+        
+        if 'course_breakdown' in result:
+            result['course_breakdown'] = [result['course_breakdown'][i] for i in order]
+            for entry, code in zip(result['course_breakdown'], course_list):
+                entry['course_code'] = code
+            return result
+        
+        if result.get('format') == 'compact':
+            rows = result['sections']
+            result['valid_schedules'] = [sorted(indices, key=lambda idx: position.get(rows[idx]['course_code'].upper(), 0))
+                                         for indices in result['valid_schedules']]
+            for alternatives in result.get('schedule_fields', {}).get('alternatives', []):
+                alternatives[:] = [alternatives[i] for i in order]
+            return result
+        
+        for schedule in result['valid_schedules']:
+            schedule['courses'] = [schedule['courses'][i] for i in order]
+            if 'alternatives' in schedule:
+                schedule['alternatives'] = [schedule['alternatives'][i] for i in order]
+        
+        return result
+
+    def compactSchedules(self, schedules: List[Dict], table: SectionTable) -> Dict:
+        # schedules become bare index arrays; anything else they carry moves to parallel columns
+        fields: Dict[str, List] = {}
+        for schedule in schedules:
+            for name, value in schedule.items():
+                if name not in ('schedule_id', 'sections'):
+                    fields.setdefault(name, []).append(value)
+        
+        compacted = {
+            'format': 'compact',
+            'sections': table.rows,
+            'valid_schedules': [schedule['sections'] for schedule in schedules]
+        }
+        if fields:
+            compacted['schedule_fields'] = fields
+        
+        return compacted
+
+partitionScraper: Optional[UCRCourseScraper] = None
+
+def searchPartition(usable: List[List[Dict]], order: List[int], fixed: Tuple[Tuple[int, int], ...],
+                    limit: Optional[int], prefs: Optional[Dict],
+                    compat: Optional[Dict[Tuple[int, int], List[int]]] = None) -> Tuple[List, Dict]:
+    global partitionScraper
+    if partitionScraper is None:
+        partitionScraper = UCRCourseScraper(catalog_path=None)
+    
+    stats = {'nodes_visited': 0, 'branches_pruned': 0}
+    
+    if prefs is None:
+        # the fixed classes become single-bit domains over the shared matrices
+        domains = [(1 << len(classes)) - 1 for classes in usable]
+        for course, index in fixed:
+            domains[course] = 1 << index
+        positions = [{id(group): i for i, group in enumerate(classes)} for classes in usable]
+        results = []
+        for classes in partitionScraper.searchSchedules(usable, stats, order, compat, domains):
+            results.append(tuple(positions[course][id(group)] for course, group in enumerate(classes)))
+            if limit is not None and len(results) >= limit:
+                break
+        return results, stats
+    
+    restricted = list(usable)
+    for course, index in fixed:
+        restricted[course] = [usable[course][index]]
+    
+    stats.update({'schedules_scored': 0, 'bound_pruned': 0})
+    positions = [{id(member): (i, j) for i, group in enumerate(classes) for j, member in enumerate(group['members'])}
+                 for classes in usable]
+    ranked = partitionScraper.rankSchedules(restricted, stats, SchedulePrefs(prefs), order)
+    results = [(cost, tuple(positions[course][id(member)] for course, member in enumerate(combination)), breakdown)
+               for cost, combination, breakdown in ranked]
+    return results, stats
+
+def parseArgs(args: List[str], flags: Tuple[str, ...] = ()) -> Tuple[List[str], Dict]:
+    positional = []
+    options = {}
+    i = 0
+    
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith('--'):
+            name, sep, value = arg[2:].partition('=')
+            name = name.replace('-', '_')
+            if sep:
+                options[name] = value
+            elif name in flags or i + 1 >= len(args) or args[i + 1].startswith('--'):
+                # an option followed by another option has no value of its own
+                options[name] = True
+            else:
+                options[name] = args[i + 1]
+                i += 1
+        else:
+            positional.append(arg)
+        i += 1
+    
+    return positional, options
+
+def scraperOptions(options: Dict) -> Dict:
+    settings = {}
+    
+    if 'concurrency' in options:
+        settings['max_concurrency'] = int(options['concurrency'])
+    if 'rate' in options:
+        settings['rate_limit'] = float(options['rate'])
+    if 'burst' in options:
+        settings['rate_burst'] = int(options['burst'])
+    if options.get('no_cache'):
+        settings['catalog_path'] = None
+    elif 'cache' in options:
+        settings['catalog_path'] = options['cache']
+    if 'ttl' in options:
+        settings['cache_ttl'] = float(options['ttl'])
+    if options.get('stale_while_revalidate'):
+        settings['stale_while_revalidate'] = True
+    if options.get('offline'):
+        settings['offline'] = True
+    if 'processes' in options:
+        settings['processes'] = int(options['processes'])
+    if options.get('source') and options['source'] != 'banner':
+        settings['source'] = options['source']
+        # recorded and fixture sections should not land in the shared live cache
+        if 'cache' not in options:
+            settings['catalog_path'] = None
+    if 'record' in options:
+        settings['record_dir'] = options['record']
+    if 'base_url' in options:
+        settings['base_url'] = options['base_url'].rstrip('/')
+    if 'popularity_log' in options:
+        settings['popularity_log'] = options['popularity_log']
+    if options.get('no_result_cache'):
+        settings['cache_results'] = False
+    elif 'result_cache' in options or 'result_cache_mb' in options:
+        megabytes = float(options.get('result_cache_mb', RESULT_CACHE_BYTES / (1024 * 1024)))
+        # a bare --result-cache keeps results in memory only
+        disk_path = options.get('result_cache')
+        settings['result_cache'] = ResultCache(int(megabytes * 1024 * 1024), disk_path if isinstance(disk_path, str) else None)
+    
+    return settings
+
+def loadSpec(value: Optional[str]) -> Optional[Dict]:
+    if not value:
+        return None
+    
+    if value.lstrip().startswith('{'):
+        return json.loads(value)
+    
+    with open(value) as f:
+        return json.load(f)
+
+def readSubjects(path: str) -> List[str]:
+    with open(path) as f:
+        text = f.read()
+    
+    subjects = re.findall(r'subject:\s*["\']([A-Z]+)["\']', text)
+    if not subjects:
+        subjects = [line.strip().upper() for line in text.splitlines() if line.strip()]
+    
+    return list(dict.fromkeys(subjects))
+
+def readWarmList(path: str, term: Optional[str] = None,
+                 window: float = POPULARITY_WINDOW) -> Tuple[List[str], List[Tuple[str, str]]]:
+    with open(path) as f:
+        text = f.read()
+    
+    # a popularity log from --popularity-log ranks courses and pairs by recent demand
+    if text.lstrip().startswith('{'):
+        courseCounts: Dict[str, int] = {}
+        pairCounts: Dict[Tuple[str, str], int] = {}
+        since = time.time() - window
+        for line in text.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('at', 0) < since or (term and record.get('term') != term):
+                continue
+            codes = sorted(set(record.get('courses') or []))
+            for code in codes:
+                courseCounts[code] = courseCounts.get(code, 0) + 1
+            for pair in itertools.combinations(codes, 2):
+                pairCounts[pair] = pairCounts.get(pair, 0) + 1
+        
+        courses = sorted(courseCounts, key=lambda code: -courseCounts[code])
+        pairs = sorted(pairCounts, key=lambda pair: -pairCounts[pair])
+        return courses, pairs[:WARM_PAIRS]
+    
+    # a course catalog (MacBoot-Courses.txt, routes/courses.js) or one code per line; without demand
+    # data lower-division courses go first since that is where registration traffic piles up
+    courses = [f"{subject}{code}" for subject, code in
+               re.findall(r'subject:\s*["\']([A-Z]+)["\'],\s*code:\s*["\']([0-9]+[A-Z]*)["\']', text)]
+    if not courses:
+        courses = [line.strip().upper().replace(' ', '') for line in text.splitlines() if line.strip()]
+    
+    # headers and notes carry no course number and cannot be looked up
+    courses = [code for code in dict.fromkeys(courses) if re.search(r'\d', code)]
+    upper = [code for code in courses if int(re.search(r'\d+', code).group(0)) >= 100]
+    return [code for code in courses if code not in set(upper)] + upper, []
+
+def warmLoop(scraper: UCRCourseScraper, term: str, courses: List[str], path: Optional[str],
+             interval: Optional[float], max_courses: Optional[int] = None, progress=None):
+    while True:
+        # a popularity log may not exist until the first request has been served
+        targets, pairs = readWarmList(path, term) if path and os.path.exists(path) else ([], [])
+        targets = list(dict.fromkeys([code.upper() for code in courses] + targets))[:max_courses]
+        started = time.monotonic()
+        result = scraper.warmCourses(term, targets, pairs, interval or 0.0, progress)
+        yield result
+        
+        if not interval:
+            return
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+def warmThread(options: Dict, term: str) -> threading.Thread:
+    # its own scraper so warm traffic keeps its own rate budget and never mixes into request metrics
+    scraper = UCRCourseScraper(**scraperOptions({**options, 'rate': options.get('warm_rate', WARM_RATE), 'burst': 1}))
+    if scraper.catalog is None:
+        raise Exception("Warming needs the section cache")
+    interval = float(options.get('interval', WARM_INTERVAL))
+    max_courses = int(options['max_courses']) if 'max_courses' in options else None
+    # a bare --warm follows the popularity log this process writes
+    path = options['warm'] if isinstance(options['warm'], str) else options.get('popularity_log')
+    if not path:
+        raise Exception("--warm needs a course list or popularity log path")
+    
+    def run():
+        for result in warmLoop(scraper, term, [], path, interval, max_courses):
+            reportProgress({name: value for name, value in result.items() if name != 'metrics'})
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def reportProgress(update: Dict):
+    sys.stderr.write(json.dumps(update) + '\n')
+    sys.stderr.flush()
+
+def handleRequest(scraper: UCRCourseScraper, request: Dict) -> Dict:
+    command = request.get('command', 'generate')
+    
+    if command == 'ping':
+        return {'success': True}
+    
+    if command == 'generate':
+        courses = request.get('courses') or []
+        if not courses:
+            return {
+                'success': False,
+                'error': 'No courses provided'
+            }
+        return scraper.scheduleGenerate(courses, request.get('term') or '202540', request.get('limit'),
+                                        request.get('prefs'), request.get('constraints'), bool(request.get('grouped')),
+                                        request.get('format') == 'compact', request.get('page_size'), request.get('cursor'))
+    
+    if command == 'count':
+        courses = request.get('courses') or []
+        if not courses:
+            return {
+                'success': False,
+                'error': 'No courses provided'
+            }
+        return scraper.countSchedules(courses, request.get('term') or '202540', request.get('constraints'))
+    
+    if command == 'plan':
+        if not request.get('plan_id'):
+            return {
+                'success': False,
+                'error': 'No plan_id provided'
+            }
+        if request.get('drop'):
+            return scraper.planDrop(request['plan_id'])
+        return scraper.planUpdate(request['plan_id'], request.get('term') or '202540', request.get('add'),
+                                  request.get('remove'), request.get('courses'), request.get('constraints'),
+                                  request.get('limit'), request.get('prefs'), bool(request.get('grouped')),
+                                  request.get('format') == 'compact')
+    
+    if command == 'harvest':
+        subjects = request.get('subjects')
+        if request.get('subjects_from'):
+            subjects = readSubjects(request['subjects_from'])
+        return scraper.harvestTerm(request.get('term') or '202540', subjects, request.get('checkpoint'),
+                                   reportProgress)
+    
+    if command == 'seats':
+        return scraper.refreshSeats(request.get('term') or '202540', request.get('courses'), request.get('crns'))
+    
+    if command == 'invalidate':
+        if scraper.catalog is None:
+            return {
+                'success': False,
+                'error': 'Section cache is disabled'
+            }
+        return {
+            'success': True,
+            'invalidated': scraper.catalog.invalidate(request.get('term'), request.get('courses'))
+        }
+    
+    return {
+        'success': False,
+        'error': f'Unknown command: {command}'
+    }
+
+def streamRecords(scraper: UCRCourseScraper, request: Dict) -> Iterator[Dict]:
+    courses = request.get('courses') or []
+    
+    if not courses:
+        yield {
+            'type': 'summary',
+            'success': False,
+            'error': 'No courses provided'
+        }
+        return
+    
+    scraper.metrics.reset()
+    summary = {}
+    table = SectionTable() if request.get('format') == 'compact' else None
+    if request.get('page_size') is not None or request.get('cursor'):
+        schedules = scraper.iterPage(courses, request.get('term') or '202540',
+                                     PAGE_SIZE if request.get('page_size') is None else request['page_size'],
+                                     request.get('cursor'), summary, request.get('prefs'), request.get('constraints'),
+                                     bool(request.get('grouped')), table, request.get('limit'))
+    else:
+        schedules = scraper.iterSchedules(courses, request.get('term') or '202540', request.get('limit'), summary,
+                                          request.get('prefs'), request.get('constraints'), bool(request.get('grouped')),
+                                          table)
+    for schedule in schedules:
+        if table is not None:
+            # each section goes out once, just before the first schedule that references it
+            for index, section in table.pending():
+                yield {'type': 'section', 'index': index, **section}
+        yield {'type': 'schedule', **schedule}
+    
+    summary['metrics'] = scraper.resultMetrics(summary.get('search_stats'))
+    if table is not None:
+        summary['format'] = 'compact'
+    yield {'type': 'summary', **summary}
+
+def serveLines(scraper: UCRCourseScraper, reader, writer, lock: threading.Lock):
+    for line in reader:
+        line = line.strip()
+        if not line:
+            continue
+        
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            with lock, profiled(request.get('profile')):
+                if request.get('stream'):
+                    for record in streamRecords(scraper, request):
+                        writer.write(json.dumps({'id': request_id, **record}, separators=COMPACT_SEPARATORS) + '\n')
+                        writer.flush()
+                    continue
+                response = handleRequest(scraper, request)
+        except Exception as e:
+            response = {
+                'success': False,
+                'error': str(e)
             }
-            
-            for courseCombo in combination:
-                courseS = {
-                    'course_code': courseCombo['lecture']['course_code'],
-                    'lecture': {
-                        'crn': courseCombo['lecture']['crn'],
-                        'section': courseCombo['lecture']['section'],
-                        'schedule': courseCombo['lecture']['schedule'],
-                        'location': courseCombo['lecture']['location'],
-                        'instructors': courseCombo['lecture']['instructors']
-                    }
-                }
-                
-                if courseCombo['lab']:
-                    courseS['lab'] = {
-                        'crn': courseCombo['lab']['crn'],
-                        'section': courseCombo['lab']['section'],
-                        'schedule': courseCombo['lab']['schedule'],
-                        'location': courseCombo['lab']['location'],
-                        'instructors': courseCombo['lab']['instructors']
-                    }
-                
-                if courseCombo['discussion']:
-                    courseS['discussion'] = {
-                        'crn': courseCombo['discussion']['crn'],
-                        'section': courseCombo['discussion']['section'],
-                        'schedule': courseCombo['discussion']['schedule'],
-                        'location': courseCombo['discussion']['location'],
-                        'instructors': courseCombo['discussion']['instructors']
-                    }
-                
-                schedule['courses'].append(courseS)
-            
-            results['valid_schedules'].append(schedule)
         
-        return results
+        writer.write(json.dumps({'id': request_id, **response}, separators=COMPACT_SEPARATORS) + '\n')
+        writer.flush()
+
+def serve(options: Dict):
+    scraper = UCRCourseScraper(**scraperOptions(options))
+    lock = threading.Lock()
+    if options.get('warm'):
+        warmThread(options, options.get('term') or '202540')
+    socket_path = options.get('socket')
+    
+    if not socket_path:
+        serveLines(scraper, sys.stdin, sys.stdout, lock)
+        return
+    
+    class LineHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            reader = io.TextIOWrapper(self.rfile, encoding='utf-8')
+            writer = io.TextIOWrapper(self.wfile, encoding='utf-8')
+            serveLines(scraper, reader, writer, lock)
+    
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    
+    with socketserver.ThreadingUnixStreamServer(socket_path, LineHandler) as server:
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+@contextlib.contextmanager
+def profiled(path: Optional[str]):
+    if not path:
+        yield
+        return
+    
+    # only the calling thread is profiled; fetch workers show up as time waiting on their futures
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
 
 def main():
-    if len(sys.argv) < 3:
+    if len(sys.argv) < 2:
         print(json.dumps({
             'success': False,
             'error': 'Usage: Generate Error'
@@ -597,27 +3380,104 @@ def main():
         return
     
     command = sys.argv[1]
+    courses, options = parseArgs(sys.argv[2:], flags=('no_cache', 'stale_while_revalidate', 'offline', 'stream',
+                                                      'grouped', 'profile', 'no_result_cache'))
     
-    if command != 'generate':
-        print(json.dumps({
-            'success': False,
-            'error': f'Unknown command: {command}'
-        }))
+    profile_path = options.get('profile')
+    with profiled(PROFILE_PATH if profile_path is True else profile_path):
+        runCommand(command, courses, options)
+
+def writeOutput(result: Dict, options: Dict, streaming: bool = False):
+    if options.get('encoding') == 'msgpack':
+        try:
+            import msgpack
+        except ImportError:
+            raise Exception("msgpack output needs the msgpack package (pip install msgpack)")
+        # msgpack objects are self-delimiting, so a stream is just the records back to back
+        sys.stdout.buffer.write(msgpack.packb(result, use_bin_type=True))
+        sys.stdout.buffer.flush()
         return
     
-    courses = sys.argv[2:]
+    if streaming or options.get('format') == 'compact':
+        sys.stdout.write(json.dumps(result, separators=COMPACT_SEPARATORS) + '\n')
+    else:
+        sys.stdout.write(json.dumps(result, indent=2) + '\n')
+    sys.stdout.flush()
+
+def runCommand(command: str, courses: List[str], options: Dict):
+    if command == 'serve':
+        serve(options)
+        return
     
-    if not courses:
+    if command == 'harvest':
+        try:
+            scraper = UCRCourseScraper(**scraperOptions(options))
+            results = handleRequest(scraper, {
+                'command': command,
+                'term': options.get('term'),
+                'subjects': courses or None,
+                'subjects_from': options.get('subjects_from'),
+                'checkpoint': options.get('checkpoint')
+            })
+            print(json.dumps(results, indent=2))
+        except Exception as e:
+            print(json.dumps({
+                'success': False,
+                'error': str(e)
+            }))
+        return
+    
+    if command == 'warm':
+        if not courses and not options.get('from'):
+            print(json.dumps({
+                'success': False,
+                'error': 'No courses provided; pass course codes or --from a course list or popularity log'
+            }))
+            return
+        
+        try:
+            scraper = UCRCourseScraper(**scraperOptions({'rate': WARM_RATE, 'burst': 1, **options}))
+            interval = float(options['interval']) if 'interval' in options else None
+            for result in warmLoop(scraper, options.get('term') or '202540', courses, options.get('from'), interval,
+                                   int(options['max_courses']) if 'max_courses' in options else None, reportProgress):
+                writeOutput(result, options, streaming=interval is not None)
+        except Exception as e:
+            print(json.dumps({
+                'success': False,
+                'error': str(e)
+            }))
+        return
+    
+    if command not in ('generate', 'count', 'invalidate', 'seats'):
         print(json.dumps({
             'success': False,
-            'error': 'No courses provided'
+            'error': f'Unknown command: {command}'
         }))
         return
     
     try:
-        scraper = UCRCourseScraper()
-        results = scraper.scheduleGenerate(courses)
-        print(json.dumps(results, indent=2))
+        scraper = UCRCourseScraper(**scraperOptions(options))
+        request = {
+            'command': command,
+            'courses': courses,
+            'term': options.get('term'),
+            'limit': int(options['limit']) if 'limit' in options else None,
+            'prefs': loadSpec(options.get('prefs')),
+            'constraints': loadSpec(options.get('constraints')),
+            'grouped': bool(options.get('grouped')),
+            'format': options.get('format'),
+            'crns': options['crns'].split(',') if options.get('crns') else None,
+            'page_size': int(options['page_size']) if 'page_size' in options else None,
+            'cursor': options.get('cursor')
+        }
+        
+        if command == 'generate' and options.get('stream'):
+            for record in streamRecords(scraper, request):
+                writeOutput(record, options, streaming=True)
+        else:
+            writeOutput(handleRequest(scraper, request), options)
+        sys.stdout.flush()
+        scraper.waitForRefreshes()
     except Exception as e:
         print(json.dumps({
             'success': False,
@@ -0,0 +1,73 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+import course_scraper
+from bench.catalog import syntheticCatalog
+from bench.runner import TERM, writeReplay
+
+def crnSets(result):
+    return [sorted(part['crn'] for course in schedule['courses'] for name, part in course.items() if name != 'course_code')
+            for schedule in result['valid_schedules']]
+
+class CursorPagingTest(unittest.TestCase):
+    def setUp(self):
+        self.replay_dir = tempfile.mkdtemp(prefix='schedule-paging-')
+        self.catalog = syntheticCatalog(3, 4, 2, 1, 0.1, 1)
+        writeReplay(self.catalog, self.replay_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.replay_dir, ignore_errors=True)
+
+    def scraper(self):
+        return course_scraper.UCRCourseScraper(catalog_path=os.path.join(self.replay_dir, 'catalog.sqlite3'),
+                                               source=self.replay_dir)
+
+    def walk(self, scraper, courses, page_size):
+        pages = []
+        cursor = None
+        while True:
+            result = scraper.scheduleGenerate(courses, TERM, page_size=page_size, cursor=cursor)
+            self.assertTrue(result['success'], result.get('error'))
+            self.assertEqual([code.upper() for code in result['courses_analyzed']], [code.upper() for code in courses])
+            pages.append(result)
+            cursor = result['next_cursor']
+            if cursor is None:
+                return pages
+
+    def testOrderingsShareCachedPagesAndCursors(self):
+        courses = sorted(self.catalog)
+        forward = self.walk(self.scraper(), courses, 4)
+        scraper = self.scraper()
+        scraper.scheduleGenerate(courses, TERM, page_size=4)
+        # the reversed request gets the forward first page from the cache and computes the rest from its cursors
+        backward = self.walk(scraper, courses[::-1], 4)
+        self.assertEqual(backward[0]['result_cache'], 'memory')
+        self.assertGreater(len(forward), 1)
+        self.assertEqual([crnSets(page) for page in backward], [crnSets(page) for page in forward])
+        for page in backward:
+            for schedule in page['valid_schedules']:
+                self.assertEqual([course['course_code'] for course in schedule['courses']], courses[::-1])
+
+    def testPagesMatchFullGenerate(self):
+        courses = sorted(self.catalog)
+        scraper = self.scraper()
+        full = scraper.scheduleGenerate(courses, TERM)
+        pages = self.walk(scraper, courses, 7)
+        self.assertEqual(sum((crnSets(page) for page in pages), []), crnSets(full))
+
+    def testForeignCursorIsRejected(self):
+        courses = sorted(self.catalog)
+        scraper = self.scraper()
+        cursor = scraper.scheduleGenerate(courses, TERM, page_size=2)['next_cursor']
+        result = scraper.scheduleGenerate(courses[:-1], TERM, page_size=2, cursor=cursor)
+        self.assertFalse(result['success'])
+
+if __name__ == '__main__':
+    unittest.main()